@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+属和名から科名・属学名へのマッピングを構築する
+
+Genus-level host records ("カエデ属", "ヤナギ属" ...) are collected from the
+host CSVs and resolved against wamei_checklist_ver.1.10.csv and, when it is
+present, the YList download the frontend reads. A Japanese genus name is
+normally the name of its type species plus 属, so "X属" is looked up as X
+first, then by the majority family of all names ending in X.
+
+The result is written to genus_mapping.csv (属和名,科名,属学名), which is
+rebuilt from scratch on every run. Manual corrections go in
+genus_overrides.csv (same columns); its rows replace the derived ones.
+"""
+
+import csv
+import os
+import re
+from collections import Counter
+
+from records import iter_records
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+GENUS_MAPPING_FILE = os.path.join(ROOT, 'genus_mapping.csv')
+GENUS_OVERRIDES_FILE = os.path.join(ROOT, 'genus_overrides.csv')
+CHECKLIST_FILE = os.path.join(ROOT, 'wamei_checklist_ver.1.10.csv')
+YLIST_FILE = os.path.join(ROOT, '20210514YList_download.csv')
+
+HOST_FILES = [
+    os.path.join(ROOT, 'ListMJ_hostplants_master.csv'),
+    os.path.join(ROOT, 'hamushi_species_integrated.csv'),
+    os.path.join(ROOT, 'butterfly_host.csv'),
+    os.path.join(ROOT, 'buprestidae_host.csv'),
+    os.path.join(ROOT, 'leafbeetle_hostplants.csv'),
+]
+
+GENUS_PATTERN = re.compile(r'[ァ-ヶー]{2,20}属')
+
+# load_genus_mapping() の結果（プロセス内キャッシュ、ファイルの絶対パスごと）
+_genus_mappings = {}
+
+
+def to_family_name(name):
+    """チェックリストの科名（「イネ」）を「イネ科」の形にそろえる"""
+    name = name.strip()
+    if not name or name == '#N/A':
+        return ''
+    return name if name.endswith('科') else f"{name}科"
+
+
+def load_checklist_index(checklist_file):
+    """和名 -> 科名 の索引を作る。Hub name を all_name より優先する"""
+    hub_families = {}
+    all_families = {}
+
+    for row in iter_records(checklist_file):
+        family = to_family_name(row.get('Family name (JP)'))
+        if not family:
+            continue
+        hub_name = row.get('Hub name').strip()
+        all_name = row.get('all_name').strip()
+        if hub_name:
+            # 同名の Hub name が複数科にある場合は all_name と一致する方を採る
+            if hub_name not in hub_families or all_name == hub_name:
+                hub_families[hub_name] = family
+        if all_name and all_name not in all_families:
+            all_families[all_name] = family
+
+    for name, family in hub_families.items():
+        all_families[name] = family
+
+    return all_families
+
+
+def load_ylist_index(ylist_file):
+    """和名 -> (科名, 属学名) の索引を作る。YList がなければ空"""
+    index = {}
+    if not os.path.exists(ylist_file):
+        print(f"YList not found, genus scientific names limited to overrides: {ylist_file}")
+        return index
+
+    for row in iter_records(ylist_file):
+        wamei = row.get('和名').strip()
+        scientific_name = row.get('学名').strip()
+        if not wamei or wamei in index:
+            continue
+        genus = scientific_name.split()[0] if scientific_name else ''
+        index[wamei] = (to_family_name(row.get('LAPG 科名')), genus)
+
+    return index
+
+
+def collect_genus_names(host_files):
+    """食草データに現れる「〜属」を集める"""
+    names = Counter()
+    for host_file in host_files:
+        if not os.path.exists(host_file):
+            continue
+        with open(host_file, 'r', encoding='utf-8-sig') as f:
+            names.update(GENUS_PATTERN.findall(f.read()))
+    return names
+
+
+def _majority_by_suffix(base, index, pick):
+    """base で終わる和名の多数決で値を決める"""
+    votes = Counter()
+    for name, value in index.items():
+        if name.endswith(base):
+            value = pick(value)
+            if value:
+                votes[value] += 1
+    return votes.most_common(1)[0][0] if votes else ''
+
+
+def resolve_genus(genus_name, checklist_index, ylist_index):
+    """「X属」を (科名, 属学名) に解決する。解決できなければ None"""
+    base = genus_name[:-1] if genus_name.endswith('属') else genus_name
+    if len(base) < 2:
+        return None
+
+    family = checklist_index.get(base, '')
+    ylist_family, genus = ylist_index.get(base, ('', ''))
+    family = family or ylist_family
+
+    if not family:
+        family = _majority_by_suffix(base, checklist_index, lambda value: value)
+    if not family and ylist_index:
+        family = _majority_by_suffix(base, ylist_index, lambda value: value[0])
+    if not genus and ylist_index:
+        genus = _majority_by_suffix(base, ylist_index, lambda value: value[1])
+
+    if not family:
+        return None
+    return family, genus
+
+
+def read_genus_mapping(mapping_file):
+    """genus_mapping.csv を {属和名: (科名, 属学名)} として読む"""
+    mapping = {}
+    if not os.path.exists(mapping_file):
+        return mapping
+
+    for row in iter_records(mapping_file):
+        genus_name = row.get('属和名').strip()
+        if genus_name:
+            mapping[genus_name] = (row.get('科名').strip(), row.get('属学名').strip())
+    return mapping
+
+
+def build_genus_mapping(output_file=GENUS_MAPPING_FILE, checklist_file=CHECKLIST_FILE,
+                        ylist_file=YLIST_FILE, host_files=HOST_FILES, overrides_file=GENUS_OVERRIDES_FILE):
+    """
+    食草データ中の属名を解決し genus_mapping.csv を書き出す
+    """
+    overrides = read_genus_mapping(overrides_file)
+    checklist_index = load_checklist_index(checklist_file)
+    ylist_index = load_ylist_index(ylist_file)
+    genus_names = collect_genus_names(host_files)
+
+    mapping = {}
+    unresolved = []
+    for genus_name in sorted(genus_names):
+        resolved = resolve_genus(genus_name, checklist_index, ylist_index)
+        if resolved:
+            mapping[genus_name] = resolved
+        else:
+            unresolved.append(genus_name)
+
+    # genus_overrides.csv の行は手動での指定として優先する
+    mapping.update(overrides)
+
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['属和名', '科名', '属学名'])
+        for genus_name in sorted(mapping):
+            family, genus = mapping[genus_name]
+            writer.writerow([genus_name, family, genus])
+
+    print(f"Genus mapping written to: {output_file}")
+    print(f"Resolved {len(mapping)} genera ({len(overrides)} overrides), {len(unresolved)} unresolved")
+    if unresolved:
+        print(f"Unresolved: {', '.join(unresolved[:20])}")
+
+    return mapping
+
+
+def load_genus_mapping(mapping_file=GENUS_MAPPING_FILE):
+    """
+    属和名 -> (科名, 属学名) の辞書を返す
+
+    Only reads genus_mapping.csv; the genus_mapping pipeline step (or running
+    this module) writes it. Each file's dict is kept in memory for the life
+    of the process.
+    """
+    key = os.path.abspath(mapping_file)
+    if key not in _genus_mappings:
+        if not os.path.exists(mapping_file):
+            print(f"{mapping_file} not found; run build_genus_mapping.py first")
+        _genus_mappings[key] = read_genus_mapping(mapping_file)
+    return _genus_mappings[key]
+
+
+def attach_genus_family(plant_name, mapping):
+    """科名のない「X属」に科名を付ける（例: 「カエデ属 (ムクロジ科)」）"""
+    name = plant_name.strip()
+    if not name.endswith('属') or name not in mapping:
+        return plant_name
+    family = mapping[name][0]
+    return f"{name} ({family})" if family else plant_name
+
+
+if __name__ == "__main__":
+    build_genus_mapping()
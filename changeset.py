@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+修正内容を JSONL の変更セットとして記録する
+
+The cleaner and the fix_csv_* / fix_remaining_issues scripts record the rows
+they repair here instead of printing one line per row; their --changes PATH
+option (add_changeset_arguments) writes the full list and --quiet keeps the
+output to the counts. Use it as a context manager so the file is flushed and
+closed even when a run fails part way.
+
+Each change is one JSON line: row number, row key (usually 和名), column,
+before, after and the ID of the rule that made it. Lines are buffered and
+written in blocks, so a run over the full catalog is not bound by terminal
+output. Without a path only the counts and the first few changes are kept
+for the summary.
+"""
+
+import json
+from collections import Counter
+
+BUFFER_SIZE = 1000
+SAMPLE_SIZE = 10
+
+
+class ChangeSet:
+    """Buffered JSONL writer for row-level changes."""
+
+    def __init__(self, path=None, buffer_size=BUFFER_SIZE, sample_size=SAMPLE_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.sample_size = sample_size
+        self.counts = Counter()
+        self.samples = []
+        self._buffer = []
+        self._file = open(path, 'w', encoding='utf-8') if path else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def record(self, row, key, column, before, after, rule):
+        """1件の変更を記録する"""
+        change = {
+            'row': row,
+            'key': key,
+            'column': column,
+            'before': before,
+            'after': after,
+            'rule': rule,
+        }
+        self.counts[rule] += 1
+        if len(self.samples) < self.sample_size:
+            self.samples.append(change)
+        if self._file:
+            self._buffer.append(json.dumps(change, ensure_ascii=False))
+            if len(self._buffer) >= self.buffer_size:
+                self.flush()
+
+    def flush(self):
+        if self._file and self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._buffer = []
+
+    def close(self):
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def print_summary(self, quiet=False):
+        """ルール別の件数を表示する。quiet でなければ先頭の数件も表示する"""
+        print(f"   - changes: {len(self)}")
+        for rule, count in self.counts.most_common():
+            print(f"     {rule}: {count}")
+        if self.path:
+            print(f"   - change set: {self.path}")
+
+        if quiet or not self.samples:
+            return
+        print(f"\n   first {len(self.samples)} changes:")
+        for change in self.samples:
+            before = str(change['before'])[:60]
+            after = str(change['after'])[:60]
+            print(f"   Row {change['row']} ({change['key']}) [{change['rule']}] {before} -> {after}")
+
+
+def add_changeset_arguments(parser):
+    """--changes / --quiet を argparse に追加する"""
+    parser.add_argument('--changes', metavar='PATH', help="write every change as JSONL to PATH")
+    parser.add_argument('--quiet', action='store_true', help="print only the summary counts")
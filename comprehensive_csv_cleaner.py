@@ -3,10 +3,15 @@
 包括的なCSVクリーナー - 不適切な植物名を除去し、正しい植物名のみを抽出
 """
 
+import argparse
 import csv
 import re
 import sys
 
+from build_genus_mapping import attach_genus_family, load_genus_mapping
+from changeset import ChangeSet, add_changeset_arguments
+from records import iter_rows
+
 def is_valid_plant_name(plant_name):
     """植物名として有効かどうかを検証"""
     if not plant_name or not isinstance(plant_name, str):
@@ -112,115 +117,209 @@ def is_valid_plant_name(plant_name):
     
     return True
 
-def extract_plant_names(text):
-    """テキストから植物名を抽出"""
+PLANT_DELIMITERS = frozenset(';；,，、')
+OPEN_BRACKETS = frozenset('（(')
+CLOSE_BRACKETS = frozenset('）)')
+SENTENCE_ENDS = frozenset('。．')
+QUOTE_CHARS = frozenset('"＂“”')
+PLANT_NAME_CHAR = re.compile(r'[ア-ン一-龯ァ-ヶー]')
+# 「ムラサキシキブの花」「ミヤマキリシマの葉・花」のような部位の記載
+PLANT_PART_PATTERN = re.compile(r'の([花蕾葉実枝芽茎根果種子樹皮新若生穂・]+)$')
+# 和名のあとに続く学名（「ワラビ Pteridium aquilinum」）
+TRAILING_LATIN_PATTERN = re.compile(r'[\sA-Za-z.]+$')
+
+def _trailing_plant_name(text):
+    """科名の直前にある植物名（末尾のカタカナ・漢字の連続）を取り出す"""
+    text = TRAILING_LATIN_PATTERN.sub('', text)
+    start = len(text)
+    while start > 0 and PLANT_NAME_CHAR.match(text[start - 1]):
+        start -= 1
+    return text[start:]
+
+def tokenize_plant_text(text):
+    """
+    食草テキストを1回の走査で (植物名, 科名, 修飾語) のリストに分解する
+
+    区切り文字（; ； , ， 、）はどれでも1つのトークンの終わりになる。括弧の
+    深さを数えるので、括弧内の区切り文字では分割しない。「（…科）」はその
+    トークンの科名になり、「（以上…科）」は科名のまだない直前のトークンにも
+    付く。「など」「以上」「〜の一種」「〜の花」などの部位は修飾語として残し、
+    それ以外の括弧書きも修飾語にする。「。」以降は次の区切りまで読み飛ばす。
+    引用符（" ＂ “ ”）は括弧と同じく植物名に含めない。同じ (植物名, 科名) は
+    1回だけ返す。
+    """
     if not text:
         return []
-    
-    # 植物名（科名）のパターンを抽出
-    plant_pattern = r'([ア-ン一-龯ァ-ヶー]{2,20})\s*[（(]\s*([^）)]+科)\s*[）)]'
-    plants_with_family = []
-    
-    for match in re.finditer(plant_pattern, text):
-        plant_name = match.group(1).strip()
-        family_name = match.group(2).strip()
-        
-        # 前置詞を除去
-        prefixes = ['採卵では', '野外では', '飼育下では', 'では', 'での', 'から', 'による']
-        for prefix in prefixes:
-            if plant_name.endswith(prefix):
-                plant_name = plant_name[:-len(prefix)].strip()
-        
-        if plant_name and len(plant_name) > 1:
-            plants_with_family.append(f"{plant_name} ({family_name})")
-    
-    # セミコロンやカンマで区切られた植物名も処理
-    remaining_text = re.sub(plant_pattern, '', text)
-    simple_plants = []
-    
-    for delimiter in [';', '；', ',', '，', '、']:
-        parts = remaining_text.split(delimiter)
-        for part in parts:
-            part = part.strip()
-            # 説明文を除去
-            part = re.sub(r'以上[^科]*科', '', part)
-            part = re.sub(r'など.*$', '', part)
-            part = re.sub(r'[。．].*$', '', part)
-            
-            if is_valid_plant_name(part):
-                simple_plants.append(part)
-    
-    return plants_with_family + simple_plants
 
-def clean_csv_file(input_file, output_file, plant_column_index):
-    """CSVファイルをクリーニング"""
+    tokens = []
+    pending = []  # 科名の付いていないトークン。「以上…科」で科名が決まる
+    name = []
+    tail = []
+    bracket = []
+    depth = 0
+    family = ''
+    qualifier = ''
+    skipping = False
+
+    def set_family(value):
+        if value.startswith('以上'):
+            value = value[2:].strip()
+            for waiting in pending:
+                waiting[0] = _trailing_plant_name(waiting[0]) or waiting[0]
+                waiting[1], waiting[2] = value, '以上'
+            pending.clear()
+            return value, '以上'
+        pending.clear()
+        return value, ''
+
+    def finish():
+        raw = ''.join(name).strip()
+        token_family, token_qualifier = family, qualifier
+        if 'など' in raw or 'など' in ''.join(tail):
+            raw = raw.split('など', 1)[0].strip()
+            token_qualifier = token_qualifier or 'など'
+        if raw.endswith('の一種'):
+            raw = raw[:-3]
+            token_qualifier = token_qualifier or '一種'
+        part = PLANT_PART_PATTERN.search(raw)
+        if part:
+            raw = raw[:part.start()]
+            token_qualifier = token_qualifier or part.group(1)
+        if '以上' in raw:
+            raw, rest = (part.strip() for part in raw.split('以上', 1))
+            if rest.endswith('科') and not token_family:
+                token_family, token_qualifier = set_family('以上' + rest)
+        plant = _trailing_plant_name(raw) if token_family else raw
+        if not is_valid_plant_name(plant):
+            return
+        token = [plant, token_family, token_qualifier]
+        tokens.append(token)
+        if not token_family:
+            pending.append(token)
+
+    for char in text:
+        if char in QUOTE_CHARS:
+            continue
+        if depth:
+            if char in OPEN_BRACKETS:
+                depth += 1
+            elif char in CLOSE_BRACKETS:
+                depth -= 1
+                if not depth:
+                    content = ''.join(bracket).strip()
+                    bracket = []
+                    if skipping:
+                        continue
+                    if content.endswith('科') and not family:
+                        family, label = set_family(content)
+                        qualifier = label or qualifier
+                    elif content and not qualifier:
+                        qualifier = content
+                    continue
+            bracket.append(char)
+        elif char in PLANT_DELIMITERS:
+            if not skipping:
+                finish()
+            name, tail, family, qualifier, skipping = [], [], '', '', False
+        elif char in OPEN_BRACKETS:
+            depth = 1
+        elif char in CLOSE_BRACKETS or skipping:
+            continue
+        elif char in SENTENCE_ENDS:
+            skipping = True
+            finish()
+        elif family:
+            tail.append(char)
+        else:
+            name.append(char)
+
+    if not skipping:
+        finish()
+
+    seen = set()
+    result = []
+    for plant, plant_family, token_qualifier in tokens:
+        if (plant, plant_family) not in seen:
+            seen.add((plant, plant_family))
+            result.append((plant, plant_family, token_qualifier))
+    return result
+
+def extract_plant_names(text):
+    """テキストから植物名を抽出（「植物名 (科名)」または「植物名」の文字列）"""
+    return [f"{plant} ({family})" if family else plant
+            for plant, family, _ in tokenize_plant_text(text)]
+
+def clean_csv_file(input_file, output_file, plant_column_index, changes_file=None, quiet=False):
+    """
+    CSVファイルをクリーニング
+
+    変更は行ごとに表示せず、changes_file（JSONL）に記録して最後に集計を表示する。
+    """
     cleaned_count = 0
-    problematic_entries = []
-    
-    with open(input_file, 'r', encoding='utf-8') as infile:
-        reader = csv.reader(infile)
-        rows = list(reader)
-    
-    # ヘッダーを保持
-    header = rows[0] if rows else []
-    
-    # 各行を処理
-    for i in range(1, len(rows)):
-        if len(rows[i]) > plant_column_index:
-            original = rows[i][plant_column_index]
-            
-            # 植物名を抽出
-            valid_plants = extract_plant_names(original)
-            
-            # 抽出された植物名をさらに検証
-            validated_plants = []
-            for plant in valid_plants:
-                if is_valid_plant_name(plant):
-                    validated_plants.append(plant)
-            
-            if validated_plants:
-                # 有効な植物名をセミコロンで結合
-                cleaned = '; '.join(validated_plants)
-            else:
-                # 有効な植物名がない場合は「不明」
-                if original and original.strip() and original.strip() != '不明':
-                    problematic_entries.append({
-                        'row': i + 1,
-                        'moth': rows[i][16] if len(rows[i]) > 16 else 'Unknown',
-                        'original': original
-                    })
-                cleaned = '不明'
-            
-            if original != cleaned:
-                cleaned_count += 1
-                print(f"Row {i+1}: Cleaned")
+    problematic_count = 0
+    genus_mapping = load_genus_mapping()
+    with ChangeSet(changes_file) as changes:
+        rows = iter_rows(input_file)
+        header = next(rows, [])
+        
+        # 1行ずつ読み、クリーニングしてそのまま書き出す
+        with open(output_file, 'w', encoding='utf-8', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(header)
             
-            rows[i][plant_column_index] = cleaned
+            for i, row in enumerate(rows, start=1):
+                if len(row) > plant_column_index:
+                    original = row[plant_column_index]
+                    moth = row[16] if len(row) > 16 else 'Unknown'
+                    rule = 'host_cleaned'
+                    
+                    # 植物名を抽出
+                    valid_plants = extract_plant_names(original)
+                    
+                    # 抽出された植物名をさらに検証
+                    validated_plants = []
+                    for plant in valid_plants:
+                        if is_valid_plant_name(plant):
+                            # 属レベルの記録には科名を付ける
+                            validated_plants.append(attach_genus_family(plant, genus_mapping))
+                    
+                    if validated_plants:
+                        # 有効な植物名をセミコロンで結合
+                        cleaned = '; '.join(validated_plants)
+                    else:
+                        # 有効な植物名がない場合は「不明」
+                        if original and original.strip() and original.strip() != '不明':
+                            problematic_count += 1
+                            rule = 'host_unknown'
+                        cleaned = '不明'
+                    
+                    if original != cleaned:
+                        cleaned_count += 1
+                        changes.record(i + 1, moth, header[plant_column_index], original, cleaned, rule)
+                    
+                    row[plant_column_index] = cleaned
+                
+                writer.writerow(row)
     
-    # クリーニング済みデータを書き込み
-    with open(output_file, 'w', encoding='utf-8', newline='') as outfile:
-        writer = csv.writer(outfile)
-        writer.writerows(rows)
     
     print(f"\n✅ クリーニング完了:")
     print(f"   - 修正行数: {cleaned_count}")
-    print(f"   - 問題のあるエントリ: {len(problematic_entries)}")
-    
-    # 問題のあるエントリをレポート
-    if problematic_entries:
-        print("\n⚠️ 完全に除去されたエントリ（「不明」に変換）:")
-        for entry in problematic_entries[:10]:  # 最初の10件のみ表示
-            print(f"   Row {entry['row']} ({entry['moth']}): {entry['original'][:60]}...")
+    print(f"   - 「不明」に変換されたエントリ: {problematic_count}")
+    changes.print_summary(quiet)
     
-    return cleaned_count, problematic_entries
+    return cleaned_count, problematic_count
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="食草列の包括的なクリーニング")
+    add_changeset_arguments(parser)
+    args = parser.parse_args()
+    
     # メインのCSVファイルをクリーニング
     input_file = '/Users/akimotohiroki/insects-host-plant-explorer/public/ListMJ_hostplants_integrated_with_kiriga.csv'
     output_file = '/Users/akimotohiroki/insects-host-plant-explorer/public/ListMJ_hostplants_cleaned_comprehensive.csv'
     
     print("🧹 包括的なCSVクリーニングを開始します...\n")
     
-    cleaned, problematic = clean_csv_file(input_file, output_file, 24)  # 24列目が食草
+    cleaned, problematic = clean_csv_file(input_file, output_file, 24, args.changes, args.quiet)  # 24列目が食草
     
     print(f"\n✅ 完了: {output_file} に保存しました")
\ No newline at end of file
@@ -4,119 +4,129 @@ Final version: Fix malformed CSV where scientific names with commas are not prop
 This version correctly handles all the different patterns in the data.
 """
 
+import argparse
 import csv
 import re
 
-def fix_csv_structure(input_file, output_file):
+from changeset import ChangeSet, add_changeset_arguments
+from records import iter_rows
+
+def fix_csv_structure(input_file, output_file, changes_file=None, quiet=False):
     """
     Fix the CSV structure by properly combining scientific name columns.
     """
-    fixed_rows = []
-    
-    with open(input_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    # Process header
-    fixed_rows.append(["和名", "学名", "食草", "食草に関する備考", "成虫の発生時期"])
-    
-    # Process data rows
-    for row_num, line in enumerate(lines[1:], start=2):
-        # Parse CSV line
-        reader = csv.reader([line])
-        row = next(reader)
+    with ChangeSet(changes_file) as changes:
+        row_count = 0
         
-        if len(row) < 3:
-            print(f"Warning: Row {row_num} has insufficient columns: {row}")
-            continue
+        rows = iter_rows(input_file)
         
-        # Extract Japanese name (always first column)
-        japanese_name = row[0]
-        
-        # Initialize variables
-        scientific_name = ""
-        host_plants = ""
-        remarks = ""
-        emergence_period = ""
-        
-        # For rows with exactly 5 columns, they're already correct
-        if len(row) == 5:
-            scientific_name = row[1]
-            host_plants = row[2]
-            remarks = row[3]
-            emergence_period = row[4]
-        # For rows with 6 columns, the scientific name is split at the comma
-        elif len(row) == 6:
-            # Check if column 2 is a year (4 digits)
-            if re.match(r'^\d{4}\)?$', row[2].strip()) or re.match(r'^\[\d{4}\]\)?$', row[2].strip()):
-                # Scientific name is split: "Author", "Year"
-                scientific_name = f"{row[1]}, {row[2]}"
-                host_plants = row[3]
-                remarks = row[4]
-                emergence_period = row[5] if len(row) > 5 else ""
-            else:
-                # Different pattern
-                scientific_name = row[1]
-                host_plants = row[2]
-                remarks = row[3]
-                emergence_period = row[4]
-        else:
-            # For other cases, need to handle special patterns
-            # Row 18 is special: "Xylena formosa (Butler 1878)" without comma
-            if japanese_name == "キバラモクメキリガ" and len(row) == 7:
-                scientific_name = f"{row[1]} {row[2]}"  # No comma for this one
-                host_plants = row[3]
-                remarks = row[4]
-                emergence_period = row[5]
-            else:
-                # General case: find where scientific name ends by looking for year
-                idx = 1
-                parts = []
-                while idx < len(row):
-                    part = row[idx].strip()
-                    parts.append(part)
-                    # Check if this is a year
-                    if re.match(r'^\d{4}\)?$', part) or re.match(r'^\[\d{4}\]\)?$', part):
-                        break
-                    idx += 1
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+            
+            next(rows, None)
+            
+            # Process header
+            writer.writerow(["和名", "学名", "食草", "食草に関する備考", "成虫の発生時期"])
+            row_count += 1
+            
+            # Process data rows
+            for row_num, row in enumerate(rows, start=2):
+                if len(row) < 3:
+                    print(f"Warning: Row {row_num} has insufficient columns: {row}")
+                    continue
+                
+                # Extract Japanese name (always first column)
+                japanese_name = row[0]
+                
+                # Initialize variables
+                scientific_name = ""
+                host_plants = ""
+                remarks = ""
+                emergence_period = ""
                 
-                # Combine scientific name parts with comma before the year
-                if len(parts) >= 2:
-                    scientific_name = f"{parts[0]}, {' '.join(parts[1:])}"
+                # For rows with exactly 5 columns, they're already correct
+                if len(row) == 5:
+                    scientific_name = row[1]
+                    host_plants = row[2]
+                    remarks = row[3]
+                    emergence_period = row[4]
+                # For rows with 6 columns, the scientific name is split at the comma
+                elif len(row) == 6:
+                    # Check if column 2 is a year (4 digits)
+                    if re.match(r'^\d{4}\)?$', row[2].strip()) or re.match(r'^\[\d{4}\]\)?$', row[2].strip()):
+                        # Scientific name is split: "Author", "Year"
+                        scientific_name = f"{row[1]}, {row[2]}"
+                        host_plants = row[3]
+                        remarks = row[4]
+                        emergence_period = row[5] if len(row) > 5 else ""
+                    else:
+                        # Different pattern
+                        scientific_name = row[1]
+                        host_plants = row[2]
+                        remarks = row[3]
+                        emergence_period = row[4]
                 else:
-                    scientific_name = ' '.join(parts)
+                    # For other cases, need to handle special patterns
+                    # Row 18 is special: "Xylena formosa (Butler 1878)" without comma
+                    if japanese_name == "キバラモクメキリガ" and len(row) == 7:
+                        scientific_name = f"{row[1]} {row[2]}"  # No comma for this one
+                        host_plants = row[3]
+                        remarks = row[4]
+                        emergence_period = row[5]
+                    else:
+                        # General case: find where scientific name ends by looking for year
+                        idx = 1
+                        parts = []
+                        while idx < len(row):
+                            part = row[idx].strip()
+                            parts.append(part)
+                            # Check if this is a year
+                            if re.match(r'^\d{4}\)?$', part) or re.match(r'^\[\d{4}\]\)?$', part):
+                                break
+                            idx += 1
+                        
+                        # Combine scientific name parts with comma before the year
+                        if len(parts) >= 2:
+                            scientific_name = f"{parts[0]}, {' '.join(parts[1:])}"
+                        else:
+                            scientific_name = ' '.join(parts)
+                        
+                        # Get remaining fields
+                        idx += 1
+                        if idx < len(row):
+                            host_plants = row[idx]
+                            idx += 1
+                        if idx < len(row):
+                            remarks = row[idx]
+                            idx += 1
+                        if idx < len(row):
+                            emergence_period = row[idx]
                 
-                # Get remaining fields
-                idx += 1
-                if idx < len(row):
-                    host_plants = row[idx]
-                    idx += 1
-                if idx < len(row):
-                    remarks = row[idx]
-                    idx += 1
-                if idx < len(row):
-                    emergence_period = row[idx]
-        
-        # Clean up the scientific name
-        scientific_name = re.sub(r'\s+', ' ', scientific_name.strip())
-        
-        # Add the fixed row
-        fixed_row = [japanese_name, scientific_name, host_plants, remarks, emergence_period]
-        fixed_rows.append(fixed_row)
-        
-        # Debug output for rows that were modified
-        if len(row) != 5:
-            print(f"Row {row_num} ({japanese_name}): {len(row)} columns -> {scientific_name}")
-    
-    # Write the fixed data
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-        writer.writerows(fixed_rows)
-    
-    print(f"\nFixed CSV written to: {output_file}")
-    print(f"Total rows processed: {len(fixed_rows)}")
+                # Clean up the scientific name
+                scientific_name = re.sub(r'\s+', ' ', scientific_name.strip())
+                
+                # Write the fixed row
+                fixed_row = [japanese_name, scientific_name, host_plants, remarks, emergence_period]
+                writer.writerow(fixed_row)
+                row_count += 1
+                
+                # Record only what changed: a re-joined scientific name, or a row of
+                # another width mapped onto the five columns
+                if scientific_name != re.sub(r'\s+', ' ', row[1].strip()):
+                    changes.record(row_num, japanese_name, '学名', row[1], scientific_name, 'rejoin_scientific_name')
+                elif len(row) != 5 and fixed_row != row:
+                    changes.record(row_num, japanese_name, '行', row, fixed_row, 'unusual_structure')
+            
+        print(f"\nFixed CSV written to: {output_file}")
+        print(f"Total rows processed: {row_count}")
+    changes.print_summary(quiet)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-join scientific names split across CSV columns.")
+    add_changeset_arguments(parser)
+    args = parser.parse_args()
+    
     input_file = "/Users/akimotohiroki/insects-host-plant-explorer/public/日本のキリガ_fixed.csv"
     output_file = "/Users/akimotohiroki/insects-host-plant-explorer/public/日本のキリガ_corrected.csv"
     
-    fix_csv_structure(input_file, output_file)
\ No newline at end of file
+    fix_csv_structure(input_file, output_file, args.changes, args.quiet)
\ No newline at end of file
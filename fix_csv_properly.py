@@ -4,84 +4,105 @@ Properly fix malformed CSV where scientific names with commas are not properly q
 This correctly combines author and year with comma when they're split across columns.
 """
 
+import argparse
 import csv
 import re
 
-def fix_csv_structure(input_file, output_file):
+from changeset import ChangeSet, add_changeset_arguments
+from records import iter_rows
+
+SAMPLE_ROWS = [1, 2, 3, 4, 5, 17]  # Row indices (0-based)
+
+def fix_csv_structure(input_file, output_file, changes_file=None, quiet=False):
     """
     Fix the CSV structure by properly combining scientific name columns.
     """
-    fixed_rows = []
-    
-    with open(input_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
+    with ChangeSet(changes_file) as changes:
+        head_rows = []  # Only the first rows are kept, for the sample printed at the end
+        row_count = 0
         
-        # Process header
-        header = next(reader)
-        fixed_rows.append(["和名", "学名", "食草", "食草に関する備考", "成虫の発生時期"])
+        rows = iter_rows(input_file)
         
-        # Process data rows
-        for row_num, row in enumerate(reader, start=2):
-            if len(row) < 3:
-                print(f"Warning: Row {row_num} has insufficient columns: {row}")
-                continue
-            
-            # Extract Japanese name (always first column)
-            japanese_name = row[0]
-            
-            # Initialize variables
-            scientific_name = ""
-            host_plants = ""
-            remarks = ""
-            emergence_period = ""
-            
-            # Check if row[2] looks like a year (4 digits with optional brackets/parentheses)
-            if len(row) >= 3 and re.match(r'^[\[\(]?\d{4}[\]\)]?$', row[2].strip()):
-                # Scientific name is split: combine row[1] and row[2] with comma
-                scientific_name = f"{row[1]}, {row[2]}"
-                # Remaining fields shift by one
-                host_plants = row[3] if len(row) > 3 else ""
-                remarks = row[4] if len(row) > 4 else ""
-                emergence_period = row[5] if len(row) > 5 else ""
-            else:
-                # Normal format or already combined
-                scientific_name = row[1]
-                host_plants = row[2] if len(row) > 2 else ""
-                remarks = row[3] if len(row) > 3 else ""
-                emergence_period = row[4] if len(row) > 4 else ""
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
             
-            # Special handling for row 18 (キバラモクメキリガ) - no comma between author and year
-            if japanese_name == "キバラモクメキリガ" and ", 1878)" in scientific_name:
-                scientific_name = scientific_name.replace(", 1878)", " 1878)")
+            # Process header
+            header = next(rows)
+            fixed_header = ["和名", "学名", "食草", "食草に関する備考", "成虫の発生時期"]
+            writer.writerow(fixed_header)
+            head_rows.append(fixed_header)
+            row_count += 1
             
-            # Clean up scientific name
-            scientific_name = re.sub(r'\s+', ' ', scientific_name.strip())
-            
-            # Add the fixed row
-            fixed_row = [japanese_name, scientific_name, host_plants, remarks, emergence_period]
-            fixed_rows.append(fixed_row)
-            
-            # Debug output for modified rows
-            if len(row) > 5 or (len(row) >= 3 and re.match(r'^[\[\(]?\d{4}[\]\)]?$', row[2].strip())):
-                print(f"Row {row_num} ({japanese_name}): {len(row)} columns -> {scientific_name}")
-    
-    # Write the fixed data
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-        writer.writerows(fixed_rows)
+            # Process data rows
+            for row_num, row in enumerate(rows, start=2):
+                if len(row) < 3:
+                    print(f"Warning: Row {row_num} has insufficient columns: {row}")
+                    continue
+                
+                # Extract Japanese name (always first column)
+                japanese_name = row[0]
+                
+                # Initialize variables
+                scientific_name = ""
+                host_plants = ""
+                remarks = ""
+                emergence_period = ""
+                
+                # Check if row[2] looks like a year (4 digits with optional brackets/parentheses)
+                if len(row) >= 3 and re.match(r'^[\[\(]?\d{4}[\]\)]?$', row[2].strip()):
+                    # Scientific name is split: combine row[1] and row[2] with comma
+                    scientific_name = f"{row[1]}, {row[2]}"
+                    # Remaining fields shift by one
+                    host_plants = row[3] if len(row) > 3 else ""
+                    remarks = row[4] if len(row) > 4 else ""
+                    emergence_period = row[5] if len(row) > 5 else ""
+                else:
+                    # Normal format or already combined
+                    scientific_name = row[1]
+                    host_plants = row[2] if len(row) > 2 else ""
+                    remarks = row[3] if len(row) > 3 else ""
+                    emergence_period = row[4] if len(row) > 4 else ""
+                
+                # Special handling for row 18 (キバラモクメキリガ) - no comma between author and year
+                if japanese_name == "キバラモクメキリガ" and ", 1878)" in scientific_name:
+                    scientific_name = scientific_name.replace(", 1878)", " 1878)")
+                
+                # Clean up scientific name
+                scientific_name = re.sub(r'\s+', ' ', scientific_name.strip())
+                
+                # Write the fixed row
+                fixed_row = [japanese_name, scientific_name, host_plants, remarks, emergence_period]
+                writer.writerow(fixed_row)
+                row_count += 1
+                if len(head_rows) < SAMPLE_ROWS[-1] + 1:
+                    head_rows.append(fixed_row)
+                
+                # Record only what changed: a re-joined scientific name, or a row of
+                # another width mapped onto the five columns
+                if scientific_name != re.sub(r'\s+', ' ', row[1].strip()):
+                    changes.record(row_num, japanese_name, '学名', row[1], scientific_name, 'rejoin_scientific_name')
+                elif len(row) != 5 and fixed_row != row:
+                    changes.record(row_num, japanese_name, '行', row, fixed_row, 'unusual_structure')
+        
+        print(f"\nFixed CSV written to: {output_file}")
+        print(f"Total rows processed: {row_count}")
+    changes.print_summary(quiet)
     
-    print(f"\nFixed CSV written to: {output_file}")
-    print(f"Total rows processed: {len(fixed_rows)}")
+    if quiet:
+        return
     
     # Show sample of corrected scientific names
     print("\nSample scientific names after correction:")
-    samples = [1, 2, 3, 4, 5, 17]  # Row indices (0-based)
-    for i in samples:
-        if i < len(fixed_rows):
-            print(f"Row {i+1}: {fixed_rows[i][0]} -> {fixed_rows[i][1]}")
+    for i in SAMPLE_ROWS:
+        if i < len(head_rows):
+            print(f"Row {i+1}: {head_rows[i][0]} -> {head_rows[i][1]}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-join scientific names split across CSV columns.")
+    add_changeset_arguments(parser)
+    args = parser.parse_args()
+    
     input_file = "/Users/akimotohiroki/insects-host-plant-explorer/public/日本のキリガ_fixed.csv"
     output_file = "/Users/akimotohiroki/insects-host-plant-explorer/public/日本のキリガ_corrected.csv"
     
-    fix_csv_structure(input_file, output_file)
\ No newline at end of file
+    fix_csv_structure(input_file, output_file, args.changes, args.quiet)
\ No newline at end of file
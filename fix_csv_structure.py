@@ -9,109 +9,121 @@ The CSV should have exactly 5 columns:
 5. 成虫の発生時期 (Adult emergence period)
 """
 
+import argparse
 import csv
 import re
 
-def fix_csv_structure(input_file, output_file):
+from changeset import ChangeSet, add_changeset_arguments
+from records import iter_rows
+
+def fix_csv_structure(input_file, output_file, changes_file=None, quiet=False):
     """
     Fix the CSV structure by properly combining scientific name columns.
     """
-    fixed_rows = []
-    
-    with open(input_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
+    with ChangeSet(changes_file) as changes:
+        row_count = 0
         
-        # Process header first
-        header = next(reader)
-        # The header should be correct already
-        fixed_rows.append(header[:5])  # Ensure exactly 5 columns
+        reader = iter_rows(input_file)
         
-        # Process data rows
-        for row_num, row in enumerate(reader, start=2):
-            if len(row) < 3:
-                print(f"Warning: Row {row_num} has insufficient columns: {row}")
-                continue
-            
-            # Extract Japanese name (always first column)
-            japanese_name = row[0]
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
             
-            # Get remaining columns first
-            remaining_cols = []
+            # Process header first
+            header = next(reader)
+            # The header should be correct already
+            writer.writerow(header[:5])  # Ensure exactly 5 columns
+            row_count += 1
             
-            # Now we need to find where the scientific name ends
-            # Scientific names typically end with a year (4 digits) or a closing parenthesis followed by year
-            scientific_name_parts = []
-            idx = 1
-            found_year = False
-            
-            while idx < len(row) and not found_year:
-                part = row[idx].strip()
-                scientific_name_parts.append(part)
+            # Process data rows
+            for row_num, row in enumerate(reader, start=2):
+                if len(row) < 3:
+                    print(f"Warning: Row {row_num} has insufficient columns: {row}")
+                    continue
+                
+                # Extract Japanese name (always first column)
+                japanese_name = row[0]
                 
-                # Check if this part ends with a year pattern
-                # Patterns: "1934", "1785)", "[1889])", "[1889]", etc.
-                # Also check if next part starts with year to handle split years
-                if re.search(r'\d{4}[\]\)]?$', part):
-                    found_year = True
-                elif idx + 1 < len(row) and re.search(r'^\[?\d{4}[\]\)]?$', row[idx + 1].strip()):
-                    # Next part is just a year (possibly with brackets)
-                    scientific_name_parts.append(row[idx + 1].strip())
+                # Get remaining columns first
+                remaining_cols = []
+                
+                # Now we need to find where the scientific name ends
+                # Scientific names typically end with a year (4 digits) or a closing parenthesis followed by year
+                scientific_name_parts = []
+                idx = 1
+                found_year = False
+                
+                while idx < len(row) and not found_year:
+                    part = row[idx].strip()
+                    scientific_name_parts.append(part)
+                    
+                    # Check if this part ends with a year pattern
+                    # Patterns: "1934", "1785)", "[1889])", "[1889]", etc.
+                    # Also check if next part starts with year to handle split years
+                    if re.search(r'\d{4}[\]\)]?$', part):
+                        found_year = True
+                    elif idx + 1 < len(row) and re.search(r'^\[?\d{4}[\]\)]?$', row[idx + 1].strip()):
+                        # Next part is just a year (possibly with brackets)
+                        scientific_name_parts.append(row[idx + 1].strip())
+                        idx += 1
+                        found_year = True
+                    
                     idx += 1
-                    found_year = True
                 
-                idx += 1
-            
-            # Get remaining columns
-            remaining_cols = row[idx:] if idx < len(row) else []
-            
-            # Combine scientific name parts
-            if scientific_name_parts:
-                # Check if last part looks like host plants (contains Japanese characters or plant indicators)
-                last_part = scientific_name_parts[-1]
-                if re.search(r'[ぁ-んァ-ン一-龥]', last_part) or '、' in last_part:
-                    # This is likely host plants, not part of scientific name
-                    remaining_cols.insert(0, scientific_name_parts.pop())
+                # Get remaining columns
+                remaining_cols = row[idx:] if idx < len(row) else []
                 
-                scientific_name = ', '.join(scientific_name_parts)
-            else:
-                scientific_name = ""
-            
-            # Ensure we have exactly 5 columns
-            if len(remaining_cols) >= 3:
-                host_plants = remaining_cols[0]
-                remarks = remaining_cols[1]
-                emergence_period = remaining_cols[2] if len(remaining_cols) > 2 else ""
-            elif len(remaining_cols) == 2:
-                host_plants = remaining_cols[0]
-                remarks = remaining_cols[1]
-                emergence_period = ""
-            elif len(remaining_cols) == 1:
-                host_plants = remaining_cols[0]
-                remarks = ""
-                emergence_period = ""
-            else:
-                host_plants = ""
-                remarks = ""
-                emergence_period = ""
-            
-            # Add the fixed row
-            fixed_row = [japanese_name, scientific_name, host_plants, remarks, emergence_period]
-            fixed_rows.append(fixed_row)
+                # Combine scientific name parts
+                if scientific_name_parts:
+                    # Check if last part looks like host plants (contains Japanese characters or plant indicators)
+                    last_part = scientific_name_parts[-1]
+                    if re.search(r'[ぁ-んァ-ン一-龥]', last_part) or '、' in last_part:
+                        # This is likely host plants, not part of scientific name
+                        remaining_cols.insert(0, scientific_name_parts.pop())
+                    
+                    scientific_name = ', '.join(scientific_name_parts)
+                else:
+                    scientific_name = ""
+                
+                # Ensure we have exactly 5 columns
+                if len(remaining_cols) >= 3:
+                    host_plants = remaining_cols[0]
+                    remarks = remaining_cols[1]
+                    emergence_period = remaining_cols[2] if len(remaining_cols) > 2 else ""
+                elif len(remaining_cols) == 2:
+                    host_plants = remaining_cols[0]
+                    remarks = remaining_cols[1]
+                    emergence_period = ""
+                elif len(remaining_cols) == 1:
+                    host_plants = remaining_cols[0]
+                    remarks = ""
+                    emergence_period = ""
+                else:
+                    host_plants = ""
+                    remarks = ""
+                    emergence_period = ""
+                
+                # Write the fixed row
+                fixed_row = [japanese_name, scientific_name, host_plants, remarks, emergence_period]
+                writer.writerow(fixed_row)
+                row_count += 1
+                
+                # Record only what changed: a re-joined scientific name, or a row of
+                # another width mapped onto the five columns
+                if scientific_name != re.sub(r'\s+', ' ', row[1].strip()):
+                    changes.record(row_num, japanese_name, '学名', row[1], scientific_name, 'rejoin_scientific_name')
+                elif len(row) != 5 and fixed_row != row:
+                    changes.record(row_num, japanese_name, '行', row, fixed_row, 'unusual_structure')
             
-            # Debug output for problematic rows
-            if len(row) > 5:
-                print(f"Row {row_num} had {len(row)} columns, fixed to: {fixed_row}")
-    
-    # Write the fixed data
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-        writer.writerows(fixed_rows)
-    
-    print(f"Fixed CSV written to: {output_file}")
-    print(f"Total rows processed: {len(fixed_rows)}")
+        print(f"Fixed CSV written to: {output_file}")
+        print(f"Total rows processed: {row_count}")
+    changes.print_summary(quiet)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-join scientific names split across CSV columns.")
+    add_changeset_arguments(parser)
+    args = parser.parse_args()
+    
     input_file = "/Users/akimotohiroki/insects-host-plant-explorer/public/日本のキリガ_fixed.csv"
     output_file = "/Users/akimotohiroki/insects-host-plant-explorer/public/日本のキリガ_corrected.csv"
     
-    fix_csv_structure(input_file, output_file)
\ No newline at end of file
+    fix_csv_structure(input_file, output_file, args.changes, args.quiet)
\ No newline at end of file
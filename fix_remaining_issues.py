@@ -3,85 +3,78 @@
 Fix remaining issues in the CSV where some scientific names are still incomplete.
 """
 
+import argparse
 import csv
-import re
 
-def fix_remaining_issues(input_file, output_file):
+from changeset import ChangeSet, add_changeset_arguments
+from records import iter_rows
+
+# Names whose 「[1889])」 ended up in the next column
+LEECH_1889_NAMES = [
+    "Meganephria funesta",
+    "Daseochaeta viridis",
+    "Lithophane venusta",
+    "Eupsilia quadrilinea",
+    "Conistra albipuncta",
+    "Telorta edentata",
+    "Egira saxea",
+]
+
+def fix_remaining_issues(input_file, output_file, changes_file=None, quiet=False):
     """
     Fix remaining scientific name issues in the CSV.
+    
+    Seven 「(Leech, [1889])」 names still have the year in the next column;
+    they are re-joined and the later columns shifted back by one.
     """
-    fixed_rows = []
+    row_count = 0
     
-    with open(input_file, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
+    with ChangeSet(changes_file) as changes, open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
         
-        # Process all rows
-        for row_num, row in enumerate(reader):
+        # Process all rows, writing each one as soon as it is fixed
+        for row_num, row in enumerate(iter_rows(input_file)):
+            row_count += 1
             if row_num == 0:
                 # Header
-                fixed_rows.append(row)
+                writer.writerow(row)
                 continue
             
             # Check if scientific name appears incomplete (missing closing parenthesis)
+            original = row[1]
             scientific_name = row[1]
             
             # Fix specific patterns
-            if "Meganephria funesta (Leech" in scientific_name and "[1889])" in row[2]:
-                scientific_name = "Meganephria funesta (Leech, [1889])"
-                row[2] = row[3]  # Shift other columns
-                row[3] = row[4] if len(row) > 4 else ""
-                row[4] = row[5] if len(row) > 5 else ""
-            elif "Daseochaeta viridis (Leech" in scientific_name and "[1889])" in row[2]:
-                scientific_name = "Daseochaeta viridis (Leech, [1889])"
-                row[2] = row[3]  # Shift other columns
-                row[3] = row[4] if len(row) > 4 else ""
-                row[4] = row[5] if len(row) > 5 else ""
-            elif "Lithophane venusta (Leech" in scientific_name and "[1889])" in row[2]:
-                scientific_name = "Lithophane venusta (Leech, [1889])"
-                row[2] = row[3]  # Shift other columns
-                row[3] = row[4] if len(row) > 4 else ""
-                row[4] = row[5] if len(row) > 5 else ""
-            elif "Eupsilia quadrilinea (Leech" in scientific_name and "[1889])" in row[2]:
-                scientific_name = "Eupsilia quadrilinea (Leech, [1889])"
-                row[2] = row[3]  # Shift other columns
-                row[3] = row[4] if len(row) > 4 else ""
-                row[4] = row[5] if len(row) > 5 else ""
-            elif "Conistra albipuncta (Leech" in scientific_name and "[1889])" in row[2]:
-                scientific_name = "Conistra albipuncta (Leech, [1889])"
-                row[2] = row[3]  # Shift other columns
-                row[3] = row[4] if len(row) > 4 else ""
-                row[4] = row[5] if len(row) > 5 else ""
-            elif "Telorta edentata (Leech" in scientific_name and "[1889])" in row[2]:
-                scientific_name = "Telorta edentata (Leech, [1889])"
-                row[2] = row[3]  # Shift other columns
-                row[3] = row[4] if len(row) > 4 else ""
-                row[4] = row[5] if len(row) > 5 else ""
-            elif "Egira saxea (Leech" in scientific_name and "[1889])" in row[2]:
-                scientific_name = "Egira saxea (Leech, [1889])"
-                row[2] = row[3]  # Shift other columns
-                row[3] = row[4] if len(row) > 4 else ""
-                row[4] = row[5] if len(row) > 5 else ""
+            for name in LEECH_1889_NAMES:
+                if f"{name} (Leech" in scientific_name and "[1889])" in row[2]:
+                    scientific_name = f"{name} (Leech, [1889])"
+                    row[2] = row[3]  # Shift other columns
+                    row[3] = row[4] if len(row) > 4 else ""
+                    row[4] = row[5] if len(row) > 5 else ""
+                    break
             
             # Update the row
             row[1] = scientific_name
+            if scientific_name != original:
+                changes.record(row_num + 1, row[0], '学名', original, scientific_name, 'rejoin_leech_year')
             
             # Ensure we have exactly 5 columns
             while len(row) < 5:
                 row.append("")
             row = row[:5]
             
-            fixed_rows.append(row)
-    
-    # Write the fixed data
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-        writer.writerows(fixed_rows)
+            writer.writerow(row)
     
     print(f"Fixed CSV written to: {output_file}")
-    print(f"Total rows processed: {len(fixed_rows)}")
+    print(f"Total rows processed: {row_count}")
+    changes.print_summary(quiet)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-join the (Leech, [1889]) names left split by the earlier fix.")
+    add_changeset_arguments(parser)
+    args = parser.parse_args()
+    
     input_file = "/Users/akimotohiroki/insects-host-plant-explorer/public/日本のキリガ_corrected.csv"
     output_file = "/Users/akimotohiroki/insects-host-plant-explorer/public/日本のキリガ_final.csv"
     
-    fix_remaining_issues(input_file, output_file)
\ No newline at end of file
+    fix_remaining_issues(input_file, output_file, args.changes, args.quiet)
\ No newline at end of file
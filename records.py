@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+CSV を省メモリのレコードとして読み込む共通モジュール
+
+One parser for every script:
+  iter_rows(path)     - rows as lists of strings, header first, streamed
+  iter_records(path)  - rows as __slots__ records of a class built from the header
+  read_columns(path)  - selected columns as lists (column-oriented)
+  read_csv(path)      - (header, rows) when a script needs the whole file
+
+Blank lines are skipped, and that is the one row-index rule every script
+follows: the data row index (the N of "main-N" species ids, source_row in
+the SQLite export, row numbers in related_species.json) counts the rows
+iter_rows yields after the header, from 0. csv_index.py skips blank records
+the same way.
+
+Short cells (family names, sources, 不明, authors, years...) are interned,
+so each repeated value is stored once however many rows carry it. Files
+that wrap every line in one more layer of quotes (leafbeetle_hostplants.csv,
+ハムシ.csv) are unwrapped transparently.
+"""
+
+import csv
+import re
+import sys
+
+# Longer cells are mostly free text (host notes, remarks) and rarely repeat
+INTERN_MAX_LENGTH = 40
+
+
+def iter_rows(path, intern=True):
+    """
+    Yield every non-empty row of a CSV as a list of strings, header included.
+
+    Blank lines are not yielded, so enumerate() over the rows after the
+    header gives the data row index used for ids.
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        nested = None
+        for row in csv.reader(f):
+            if not row:
+                continue
+            if nested is None:
+                nested = len(row) == 1 and ',' in row[0]
+            if nested and len(row) == 1:
+                row = next(csv.reader([row[0]]))
+            if intern:
+                row = [sys.intern(cell) if len(cell) <= INTERN_MAX_LENGTH else cell for cell in row]
+            yield row
+
+
+def read_csv(path):
+    """Return (header, rows) of a CSV."""
+    rows = iter_rows(path)
+    header = next(rows, [])
+    return header, list(rows)
+
+
+def unique_columns(header):
+    """Column names made unique (the master CSV repeats 亜族名)."""
+    seen = {}
+    columns = []
+    for name in header:
+        name = name.strip() or 'column'
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 1
+        columns.append(name)
+    return columns
+
+
+class Record:
+    """
+    Base class of the per-header record classes made by record_class.
+
+    Columns are read as record['和名'] or record.get('Hub name'). Cells
+    beyond the header are kept in record.rest.
+    """
+
+    __slots__ = ('rest',)
+    columns = ()
+    _attributes = {}
+
+    @classmethod
+    def from_row(cls, row):
+        record = cls.__new__(cls)
+        width = len(cls.columns)
+        for attribute, value in zip(cls.__slots__, row):
+            setattr(record, attribute, value)
+        for attribute in cls.__slots__[len(row):width]:
+            setattr(record, attribute, '')
+        record.rest = tuple(row[width:])
+        return record
+
+    def __getitem__(self, column):
+        return getattr(self, self._attributes[column])
+
+    def __setitem__(self, column, value):
+        setattr(self, self._attributes[column], value)
+
+    def get(self, column, default=''):
+        attribute = self._attributes.get(column)
+        return getattr(self, attribute) if attribute else default
+
+    def values(self):
+        return [getattr(self, attribute) for attribute in self.__slots__]
+
+    def as_dict(self):
+        return dict(zip(self.columns, self.values()))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+
+def record_class(header, name='Record'):
+    """
+    Make a Record subclass with one slot per column of header.
+
+    Column names that are not identifiers ("Family name (JP)") get a
+    sanitized attribute name; records are still indexed by the column name.
+    """
+    columns = unique_columns(header)
+    attributes = []
+    for index, column in enumerate(columns):
+        attribute = re.sub(r'\W', '_', column)
+        if not attribute.isidentifier() or attribute in attributes or attribute == 'rest':
+            attribute = f"c{index}_{attribute}"
+        attributes.append(attribute)
+
+    namespace = {
+        '__slots__': tuple(attributes),
+        'columns': tuple(columns),
+        '_attributes': {**dict(zip(header, attributes)), **dict(zip(columns, attributes))},
+    }
+    return type(name, (Record,), namespace)
+
+
+def iter_records(path, name='Record'):
+    """Yield the data rows of a CSV as records of a class built from its header."""
+    rows = iter_rows(path)
+    header = next(rows, None)
+    if header is None:
+        return
+    cls = record_class(header, name)
+    for row in rows:
+        yield cls.from_row(row)
+
+
+def read_columns(path, columns):
+    """
+    Load only the given columns, as {column: list of values}.
+
+    Missing cells read as ''. A column that is not in the header raises KeyError.
+    """
+    rows = iter_rows(path)
+    header = next(rows, [])
+    names = unique_columns(header)
+    positions = []
+    for column in columns:
+        if column in names:
+            positions.append((column, names.index(column)))
+        elif column in header:
+            positions.append((column, header.index(column)))
+        else:
+            raise KeyError(column)
+    table = {column: [] for column in columns}
+    for row in rows:
+        for column, position in positions:
+            table[column].append(row[position] if position < len(row) else '')
+    return table
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Measure what a first visit costs, per route, against a data budget.
+
+Serves the site directory from a local static server (missing paths get
+404.html with status 404, as on GitHub Pages) and replays the requests the
+app in assets/index-*.js makes on a cold visit. Text files are sent
+compressed, as the browser would get them: the .br/.gz sibling from
+precompress.py if there is one, otherwise gzipped on the fly as GitHub
+Pages does.
+
+  shell     index.html, then its same-origin scripts, stylesheets, icons
+            and preloads; deep links first get 404.html and its /?/ redirect
+  data      the CSVs loaded on startup (master and 冬尺蛾 cache-busted,
+            so never cached)
+  home      shell + data + image manifests + thumbnails of the first
+            result page (species with images are listed first)
+  species   /moth/{id}: shell + data + image_extensions.json + the photo,
+            trying the same candidate paths as the detail page
+  plant     /plant/{name}: shell + data + HEAD probes of every
+            images/plants/{name}_{part}.jpg/.JPG + the photos found
+  search    home, with the first result page of a name search
+
+Each URL is fetched once per visit, like the browser cache would.
+Thumbnails and search results are taken from the master CSV in file order,
+an approximation of the app's list.
+
+For every route it prints requests, bytes as served (and uncompressed),
+missing files and server-side time (the sum over requests of the time spent
+handling each one; with --repeat, the median over runs). Requests and
+served bytes are compared with BUDGETS; server time depends on the machine,
+so it is reported but never fails the check. Exits with status 1 if any
+route is over budget.
+
+Usage:
+    python scripts/bench_page_load.py [--root DIR] [--route NAME ...] [--repeat N]
+                                      [--species ID] [--plant NAME] [--query TEXT]
+                                      [--samples N] [--json PATH]
+"""
+
+import argparse
+import functools
+import gzip
+import io
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from http.client import HTTPConnection
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from build_family_shards import species_id
+from check_links import ATTRIBUTE_PATTERN, ROUTE_KINDS, SKIPPED_MARKUP, TAG_PATTERN
+from precompress import COMPRESSIBLE_EXTENSIONS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from records import iter_records
+
+# Loaded in parallel on startup, in the order the app requests them
+DATA_FILES = [
+    ('/wamei_checklist_ver.1.10.csv', False),
+    ('/ListMJ_hostplants_master.csv', True),
+    ('/20210514YList_download.csv', False),
+    ('/hamushi_species_integrated.csv', False),
+    ('/butterfly_host.csv', False),
+    ('/buprestidae_host.csv', False),
+    ('/日本の冬夜蛾.csv', False),
+    ('/日本の冬尺蛾.csv', True),
+    ('/emergence_time_integrated.csv', False),
+    ('/genus_mapping.csv', False),
+]
+
+IMAGE_MANIFESTS = ['/image_filenames.txt', '/image_extensions.json', '/plant_image_filenames.txt']
+
+# Gallery of the plant page, probed as .jpg and .JPG
+PLANT_IMAGE_SUFFIXES = ['', '_葉表', '_葉裏', '_葉表白化', '_羽状複葉', '_樹皮', '_実', '_果実',
+                        '_花', '_蕾', '_若葉', '_茎', '_枝', '_断面']
+
+PAGE_SIZE = 50
+
+SHELL_RELS = {'stylesheet', 'icon', 'preload', 'modulepreload'}
+
+# What the client accepts; br only if it can decode it
+ACCEPT_ENCODING = 'br, gzip' if brotli is not None else 'gzip'
+
+# Per route: requests and bytes as served (compressed). Set a little above
+# the tree at the time of writing, so a data change that adds weight fails
+# the check; lower them as routes get lighter.
+BUDGETS = {
+    'home': {'requests': 75, 'bytes': 37_500_000},
+    'species': {'requests': 20, 'bytes': 4_000_000},
+    'plant': {'requests': 55, 'bytes': 6_500_000},
+    'search': {'requests': 25, 'bytes': 4_800_000},
+}
+
+DEFAULT_PLANT = 'オニグルミ'
+DEFAULT_QUERY = 'シャチホコ'
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    """
+    Static handler that serves 404.html for missing paths, compresses text
+    files and logs each request.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, *args, log=None, **kwargs):
+        self.log = log
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == 'content-length':
+            self._bytes = int(value)
+        super().send_header(keyword, value)
+
+    def _send_compressed(self, path, status=200):
+        """Send a text file compressed; return its body, or None if it is not compressed."""
+        accepted = self.headers.get('Accept-Encoding', '')
+        if not path.endswith(COMPRESSIBLE_EXTENSIONS) or 'gzip' not in accepted:
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        self._raw_bytes = len(data)
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in accepted and os.path.exists(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    body = f.read()
+                break
+        else:
+            encoding, body = 'gzip', gzip.compress(data, compresslevel=6)
+        self.send_response(status)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.exists(path) and os.path.exists(path + '.html'):
+            self.path = urlsplit(self.path).path + '.html'
+            path += '.html'
+        if os.path.isdir(path) and urlsplit(self.path).path.endswith('/'):
+            path = os.path.join(path, 'index.html')
+        if os.path.exists(path):
+            return self._send_compressed(path) or super().send_head()
+        not_found = os.path.join(self.directory, '404.html')
+        body = self._send_compressed(not_found, 404)
+        if body:
+            return body
+        f = open(not_found, 'rb')
+        self.send_response(404)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+        self.end_headers()
+        return f
+
+    def handle_one_request(self):
+        self._status, self._bytes, self._raw_bytes = None, 0, None
+        start = time.perf_counter()
+        super().handle_one_request()
+        if self._status is not None:
+            served = self._bytes if self.command != 'HEAD' else 0
+            raw = self._raw_bytes if self._raw_bytes is not None else self._bytes
+            self.log.append((self.command, unquote(self.path), self._status, served,
+                             (time.perf_counter() - start) * 1000, raw if self.command != 'HEAD' else 0))
+
+
+class Visit:
+    """One cold visit: fetches each URL at most once and keeps what it fetched."""
+
+    def __init__(self, port):
+        self.connection = HTTPConnection('127.0.0.1', port)
+        self.seen = set()
+
+    def fetch(self, path, method='GET'):
+        """Return (status, decoded body), or None if this visit already fetched it."""
+        if (method, path) in self.seen:
+            return None
+        self.seen.add((method, path))
+        self.connection.request(method, quote(path, safe="/?=&~:+%"),
+                                headers={'Accept-Encoding': ACCEPT_ENCODING})
+        response = self.connection.getresponse()
+        body = response.read()
+        encoding = response.getheader('Content-Encoding')
+        if encoding == 'gzip' and body:
+            body = gzip.decompress(body)
+        elif encoding == 'br' and body:
+            body = brotli.decompress(body)
+        return response.status, body
+
+    def close(self):
+        self.connection.close()
+
+
+def image_filename(scientific_name):
+    """The images/insects file stem the app derives from a scientific name."""
+    name = re.sub(r'\s*\(.*?(?:\)|\s*$)', '', scientific_name)
+    name = re.sub(r'\s*,\s*\d{4}\s*$', '', name)
+    name = re.sub(r'\s*[A-Z][a-zA-Z\s&.]+\s*\d{4}\s*$', '', name)
+    name = re.sub(r'^([A-Z][a-z]+\s+[a-z]+)\s+[A-Z][a-zA-Z\s&.]+\s*$', r'\1', name)
+    name = re.sub(r'[^a-zA-Z0-9\s]', '', name)
+    return re.sub(r'\s+', '_', name.strip())
+
+
+def load_species(root):
+    """[(id, 和名, image file stem)] of the master CSV in file order."""
+    species = []
+    master_file = os.path.join(root, 'ListMJ_hostplants_master.csv')
+    for index, record in enumerate(iter_records(master_file)):
+        species.append((species_id(record.values(), index), record['和名'], image_filename(record['学名'])))
+    return species
+
+
+def _cache_bust():
+    now = int(time.time() * 1000)
+    return f"?v={now}&bust={time.perf_counter()}&nocache={now}&t={time.perf_counter() * 1000:.3f}"
+
+
+def load_shell(visit, path='/'):
+    """The HTML document and the same-origin assets it references."""
+    if path != '/':
+        visit.fetch(path)
+        path = '/?' + path
+    result = visit.fetch(path)
+    if not result:
+        return
+    text = SKIPPED_MARKUP.sub(lambda match: match.group(1) or '', result[1].decode('utf-8', 'replace'))
+    for match in TAG_PATTERN.finditer(text):
+        tag = match.group(1).lower()
+        attrs = {name.lower(): double or single or bare
+                 for name, double, single, bare in ATTRIBUTE_PATTERN.findall(match.group(2))}
+        url = None
+        if tag == 'script':
+            url = attrs.get('src')
+        elif tag == 'link' and SHELL_RELS & set(attrs.get('rel', '').lower().split()):
+            url = attrs.get('href')
+        if url and url.startswith('/') and not url.startswith('//'):
+            visit.fetch(url)
+
+
+def load_data(visit):
+    for path, cache_busted in DATA_FILES:
+        visit.fetch(path + (_cache_bust() if cache_busted else ''))
+
+
+def load_manifests(visit):
+    """Fetch the image manifests; return (file stems with images, extensions)."""
+    stems, extensions = set(), {}
+    for path in IMAGE_MANIFESTS:
+        result = visit.fetch(path)
+        if not result or result[0] != 200:
+            continue
+        if path == '/image_filenames.txt':
+            stems = set(result[1].decode('utf-8').split())
+        elif path == '/image_extensions.json':
+            extensions = json.loads(result[1].decode('utf-8'))
+    return stems, extensions
+
+
+def load_result_page(visit, species, stems, extensions):
+    """Thumbnails of the first page of a list, species with images first."""
+    page = sorted(species, key=lambda item: item[2] not in stems)[:PAGE_SIZE]
+    for _, _, stem in page:
+        if stem in stems:
+            visit.fetch(f"/images/insects/{stem}{extensions.get(stem, '.jpg')}")
+
+
+def route_home(visit, context):
+    load_shell(visit)
+    load_data(visit)
+    stems, extensions = load_manifests(visit)
+    load_result_page(visit, context['species'], stems, extensions)
+
+
+def route_search(visit, context):
+    load_shell(visit)
+    load_data(visit)
+    stems, extensions = load_manifests(visit)
+    query = context['query']
+    matches = [item for item in context['species'] if query in item[1] or query.lower() in item[2].lower()]
+    load_result_page(visit, matches, stems, extensions)
+
+
+def route_species(visit, context):
+    target = context['species_id']
+    load_shell(visit, f"/moth/{target}")
+    load_data(visit)
+    result = visit.fetch('/image_extensions.json')
+    extensions = json.loads(result[1].decode('utf-8')) if result and result[0] == 200 else {}
+    for species_key, wamei, stem in context['species']:
+        if species_key == target:
+            candidates = [f"/images/insects/{stem}{extensions.get(stem, '.jpg')}",
+                          f"/images/insects/{wamei}{extensions.get(wamei, '.jpg')}",
+                          f"/images/insects/{stem}.jpg", f"/images/insects/{wamei}.jpg"]
+            for candidate in candidates:
+                result = visit.fetch(candidate)
+                if result and result[0] == 200:
+                    break
+            break
+
+
+def route_plant(visit, context):
+    plant = context['plant']
+    load_shell(visit, f"/plant/{plant}")
+    load_data(visit)
+    found = []
+    for suffix in PLANT_IMAGE_SUFFIXES:
+        for extension in ('.jpg', '.JPG'):
+            path = f"/images/plants/{plant}{suffix}{extension}"
+            result = visit.fetch(path, 'HEAD')
+            if result and result[0] == 200:
+                found.append(path)
+                break
+    for path in found:
+        visit.fetch(path)
+
+
+ROUTES = {
+    'home': route_home,
+    'species': route_species,
+    'plant': route_plant,
+    'search': route_search,
+}
+
+
+def _is_deep_link(path):
+    segments = path.strip('/').split('/')
+    return len(segments) == 2 and segments[0] in ROUTE_KINDS
+
+
+def summarize(log):
+    # The 404 of a deep link is how GitHub Pages reaches the app, not a missing file
+    return {
+        'requests': len(log),
+        'bytes': sum(size for _, _, _, size, _, _ in log),
+        'raw_bytes': sum(raw for _, _, _, _, _, raw in log),
+        'ms': sum(ms for _, _, _, _, ms, _ in log),
+        'missing': sorted({path for _, path, status, _, _, _ in log
+                           if status == 404 and not _is_deep_link(path)}),
+    }
+
+
+def bench_page_load(root=ROOT, routes=None, repeat=3, context=None, budgets=BUDGETS, samples=3,
+                    report_file=None):
+    """
+    Replay each route repeat times against a local server; return the routes over budget.
+    """
+    routes = routes or list(ROUTES)
+    context = dict(context or {})
+    context['species'] = load_species(root)
+    context.setdefault('plant', DEFAULT_PLANT)
+    context.setdefault('query', DEFAULT_QUERY)
+    if not context.get('species_id'):
+        stems = set()
+        manifest = os.path.join(root, 'image_filenames.txt')
+        if os.path.exists(manifest):
+            with open(manifest, 'r', encoding='utf-8') as f:
+                stems = set(f.read().split())
+        context['species_id'] = next((key for key, _, stem in context['species'] if stem in stems),
+                                     context['species'][0][0])
+
+    log = []
+    handler = functools.partial(_Handler, directory=root, log=log)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    results = {}
+    try:
+        for name in routes:
+            runs = []
+            for _ in range(repeat):
+                del log[:]
+                visit = Visit(server.server_address[1])
+                ROUTES[name](visit, context)
+                visit.close()
+                runs.append((summarize(log), list(log)))
+            summary, requests = runs[-1]
+            summary['ms'] = statistics.median(run['ms'] for run, _ in runs)
+            summary['largest'] = sorted(((urlsplit(path).path, size) for _, path, _, size, _, _ in requests),
+                                        key=lambda item: -item[1])[:3]
+            results[name] = summary
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    over = {}
+    print(f"Page-load data budget ({root}, median of {repeat} runs)")
+    print(f"   {'route':<8} {'requests':>8} {'bytes':>12} {'uncompressed':>13} {'server ms':>10}  missing")
+    for name, summary in results.items():
+        budget = budgets.get(name, {})
+        exceeded = [key for key in ('requests', 'bytes') if key in budget and summary[key] > budget[key]]
+        if exceeded:
+            over[name] = exceeded
+        mark = '✗' if exceeded else '✓'
+        print(f" {mark} {name:<8} {summary['requests']:>8,} {summary['bytes']:>12,} {summary['raw_bytes']:>13,} "
+              f"{summary['ms']:>10.1f}  {len(summary['missing'])}")
+        for key in exceeded:
+            print(f"     over budget: {key} {summary[key]:,.0f} > {budget[key]:,}")
+        for path in summary['missing'][:samples]:
+            print(f"     missing: {path}")
+        if len(summary['missing']) > samples:
+            print(f"     ... and {len(summary['missing']) - samples:,} more missing")
+        for path, size in summary['largest']:
+            print(f"     {size:>12,}  {path}")
+
+    if report_file:
+        report = {'repeat': repeat, 'budgets': budgets, 'routes': results, 'over_budget': over}
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"\nReport written to: {report_file}")
+
+    if over:
+        print(f"\n{len(over)} route(s) over budget: {', '.join(over)}")
+    return results, over
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the app's data requests per route against a budget.")
+    parser.add_argument('--root', default=ROOT, help="site directory to serve")
+    parser.add_argument('--route', action='append', choices=list(ROUTES), help="route to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per route; server time is the median")
+    parser.add_argument('--species', help="species id for the species route (default: first with an image)")
+    parser.add_argument('--plant', default=DEFAULT_PLANT, help="plant name for the plant route")
+    parser.add_argument('--query', default=DEFAULT_QUERY, help="search text for the search route")
+    parser.add_argument('--samples', type=int, default=3, help="missing files to list per route")
+    parser.add_argument('--json', metavar='PATH', help="write the full report to PATH")
+    args = parser.parse_args()
+
+    context = {'species_id': args.species, 'plant': args.plant, 'query': args.query}
+    results, over = bench_page_load(args.root, args.route, max(1, args.repeat), context,
+                                    samples=args.samples, report_file=args.json)
+    sys.exit(1 if over else 0)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Split the master catalog into small per-family (科名) JSON shards.
+
+Writes:
+  data/families/index.json    - family list with species counts and the
+                                shard files of each family
+  data/families/<Family>.json - the rows of one family, as a column list
+                                plus rows with trailing empty cells dropped.
+                                Families over SHARD_MAX_BYTES are split into
+                                <Family>-1.json, <Family>-2.json, ... by
+                                genus (属名), and a genus that is itself too
+                                big by rows.
+  data/families/lookup/<bucket>.json - species id -> shard file (without
+                                .json), split by lookup_bucket so a detail
+                                view only fetches the ids near its own
+
+Species ids follow the meta pages: "catalog-<大図鑑カタログNo>" when the
+catalog number is set, otherwise "main-<data row index>" (the index rule of
+records.iter_rows). A catalog number
+used by more than one row keeps the plain id on its first row; the later
+rows get "-2", "-3", ... appended so every id is unique.
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from records import iter_rows
+
+UNASSIGNED_SHARD = '_unassigned'
+
+# Upper bound for one shard file; about 60 species
+SHARD_MAX_BYTES = 16 * 1024
+
+# Ids per lookup file, by the number in the id
+LOOKUP_BUCKET_SIZE = 100
+
+
+def species_id(row, index):
+    """Return the species id used by the meta pages for a master row."""
+    catalog_no = row[0].strip() if row else ''
+    if catalog_no:
+        return f"catalog-{catalog_no}"
+    return f"main-{index}"
+
+
+def unique_species_ids(rows):
+    """
+    Ids of the master data rows, made unique.
+
+    A repeated catalog number keeps its plain id on the first row and gets
+    "-2", "-3", ... on the later ones. Returns (ids, number of renamed rows).
+    """
+    ids = [species_id(row, index) for index, row in enumerate(rows)]
+    taken = set(ids)
+    seen = {}
+    renamed = 0
+    for position, row_id in enumerate(ids):
+        count = seen[row_id] = seen.get(row_id, 0) + 1
+        if count == 1:
+            continue
+        suffix = count
+        while f"{row_id}-{suffix}" in taken:
+            suffix += 1
+        ids[position] = f"{row_id}-{suffix}"
+        taken.add(ids[position])
+        renamed += 1
+    return ids, renamed
+
+
+def lookup_bucket(row_id):
+    """
+    Lookup file name of a species id: its kind and first number // 100.
+
+    "catalog-698" -> "catalog-6", "main-6172" -> "main-61"; ids without a
+    number go to "<kind>-x".
+    """
+    kind = 'catalog' if row_id.startswith('catalog-') else 'main'
+    number = re.search(r'\d+', row_id[len(kind) + 1:])
+    return f"{kind}-{int(number.group()) // LOOKUP_BUCKET_SIZE if number else 'x'}"
+
+
+def shard_name(family):
+    """Return a file-safe shard name for a family's scientific name."""
+    name = re.sub(r'[^A-Za-z0-9_-]', '', family.strip())
+    return name or UNASSIGNED_SHARD
+
+
+def _row_bytes(values):
+    return len(json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode('utf-8')) + 1
+
+
+def split_rows(rows, genus_idx, max_bytes=SHARD_MAX_BYTES):
+    """
+    Split one family's rows into chunks of at most max_bytes.
+
+    Whole genera are packed together in file order; a genus that alone is
+    over the limit is cut by rows.
+    """
+    genera = []
+    for values in rows:
+        genus = values[genus_idx + 1] if len(values) > genus_idx + 1 else ''
+        if genera and genera[-1][0] == genus:
+            genera[-1][1].append(values)
+        else:
+            genera.append((genus, [values]))
+
+    chunks = [[]]
+    size = 0
+    for _, genus_rows in genera:
+        genus_size = sum(_row_bytes(values) for values in genus_rows)
+        if chunks[-1] and size + genus_size > max_bytes:
+            chunks.append([])
+            size = 0
+        for values in genus_rows:
+            row_size = _row_bytes(values)
+            if chunks[-1] and size + row_size > max_bytes:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(values)
+            size += row_size
+    return chunks
+
+
+def build_family_shards(input_file, output_dir):
+    """
+    Group master rows by 科名 and write compact JSON shards of each family.
+    """
+    rows = iter_rows(input_file)
+    header = next(rows)
+    rows = list(rows)
+
+    family_idx = header.index('科名')
+    family_ja_idx = header.index('科和名')
+    genus_idx = header.index('属名')
+
+    ids, renamed = unique_species_ids(rows)
+
+    families = {}
+    for row_id, row in zip(ids, rows):
+        family = row[family_idx].strip() if len(row) > family_idx else ''
+        family_ja = row[family_ja_idx].strip() if len(row) > family_ja_idx else ''
+        name = shard_name(family)
+
+        shard = families.get(name)
+        if shard is None:
+            shard = families[name] = {
+                'family': family,
+                'family_ja': family_ja,
+                'rows': [],
+            }
+        elif not shard['family_ja'] and family_ja:
+            shard['family_ja'] = family_ja
+
+        # Trailing empty cells are implied by the column list
+        values = [row_id] + row
+        while values and values[-1] == '':
+            values.pop()
+        shard['rows'].append(values)
+
+    # Shards of an earlier run may have been split differently
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(os.path.join(output_dir, 'lookup'))
+
+    columns = ['id'] + header
+    index_entries = []
+    lookup = {}
+    largest = 0
+
+    # Families sort alphabetically, unassigned rows last
+    ordered = sorted(families.items(), key=lambda item: (item[0] == UNASSIGNED_SHARD, item[0]))
+    for name, shard in ordered:
+        # Leave room for the family names and the column list of each file
+        overhead = _row_bytes([shard['family'], shard['family_ja'], columns]) + 50
+        chunks = split_rows(shard['rows'], genus_idx, SHARD_MAX_BYTES - overhead)
+        files = []
+        for part, chunk in enumerate(chunks, 1):
+            file_name = f"{name}.json" if len(chunks) == 1 else f"{name}-{part}.json"
+            text = json.dumps({
+                'family': shard['family'],
+                'family_ja': shard['family_ja'],
+                'columns': columns,
+                'rows': chunk,
+            }, ensure_ascii=False, separators=(',', ':'))
+            with open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as f:
+                f.write(text)
+            largest = max(largest, len(text.encode('utf-8')))
+            files.append(file_name)
+
+            for values in chunk:
+                lookup.setdefault(lookup_bucket(values[0]), {})[values[0]] = file_name[:-5]
+
+        index_entries.append({
+            'family': shard['family'],
+            'family_ja': shard['family_ja'],
+            'count': len(shard['rows']),
+            'files': files,
+        })
+
+    with open(os.path.join(output_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'families': index_entries, 'lookup_bucket_size': LOOKUP_BUCKET_SIZE},
+                  f, ensure_ascii=False, separators=(',', ':'))
+
+    for bucket, entries in lookup.items():
+        with open(os.path.join(output_dir, 'lookup', f"{bucket}.json"), 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, separators=(',', ':'))
+
+    total = sum(entry['count'] for entry in index_entries)
+    shards = sum(len(entry['files']) for entry in index_entries)
+    print(f"Wrote {shards} shards of {len(index_entries)} families ({total} species) to: {output_dir}")
+    print(f"   largest shard {largest:,} bytes, {len(lookup)} lookup files")
+    if renamed:
+        print(f"   {renamed} rows repeat a catalog number; their ids got a -N suffix")
+
+    return index_entries
+
+
+if __name__ == "__main__":
+    input_file = os.path.join(ROOT, 'ListMJ_hostplants_master.csv')
+    output_dir = os.path.join(ROOT, 'data', 'families')
+
+    build_family_shards(input_file, output_dir)
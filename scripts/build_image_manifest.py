@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Rebuild the image manifests the frontend reads from images/.
+
+  image_filenames.txt       - every insect image stem, sorted
+  image_extensions.json     - insect image stem -> extension, backups excluded
+  plant_image_filenames.txt - every plant image stem, sorted
+
+Only files directly under images/insects and images/plants are listed;
+subdirectories such as backup_japanese_names are ignored.
+"""
+
+import json
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+
+def list_images(image_dir):
+    """Return (stem, extension) pairs for the images directly in image_dir."""
+    images = []
+    if not os.path.isdir(image_dir):
+        return images
+
+    for entry in sorted(os.listdir(image_dir)):
+        path = os.path.join(image_dir, entry)
+        stem, ext = os.path.splitext(entry)
+        if os.path.isfile(path) and ext.lower() in IMAGE_EXTENSIONS:
+            images.append((stem, ext))
+    return images
+
+
+def build_image_manifest(images_dir, output_dir):
+    """
+    Write image_filenames.txt, image_extensions.json and plant_image_filenames.txt.
+    """
+    insects = list_images(os.path.join(images_dir, 'insects'))
+    plants = list_images(os.path.join(images_dir, 'plants'))
+
+    with open(os.path.join(output_dir, 'image_filenames.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(stem for stem, _ in insects) + '\n')
+
+    extensions = {stem: ext for stem, ext in insects if not stem.endswith('_backup')}
+    with open(os.path.join(output_dir, 'image_extensions.json'), 'w', encoding='utf-8') as f:
+        json.dump(extensions, f, ensure_ascii=False, indent=2)
+
+    with open(os.path.join(output_dir, 'plant_image_filenames.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(stem for stem, _ in plants) + '\n')
+
+    print(f"Image manifest written: {len(insects)} insect images, {len(plants)} plant images")
+
+    return insects, plants
+
+
+if __name__ == "__main__":
+    build_image_manifest(os.path.join(ROOT, 'images'), ROOT)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Precompute a plant × month × insect-family phenology cube.
+
+Joins host_edges with emergence_months (both in data/hostplants.sqlite,
+from export_sqlite.py) once at build time. The plant page can then draw its
+seasonal calendar without any joins. Months are the adult emergence periods
+parsed from emergence_time_integrated.csv and the 冬夜蛾/冬尺蛾 lists.
+Plants are keyed by the canonical names of the plant pages
+(build_plant_pages.py); host strings that name no plant are left out.
+
+Outputs:
+  data/phenology.bin   little-endian typed arrays, each 4-byte aligned
+    counts        Uint16  [plant][month][family] species count
+    cell_offsets  Uint32  [plant*12*family + 1] start of each cell's species
+    species       Uint16 or Uint32  indexes into the species table below
+  data/phenology.json  plants, families, species (id, 和名) and the byte
+                       offset, element type and length of each array
+"""
+
+import array
+import json
+import os
+import sqlite3
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from build_genus_mapping import CHECKLIST_FILE, GENUS_MAPPING_FILE
+from build_plant_pages import load_standard_names, standard_plant_name
+
+MONTHS = 12
+
+ARRAY_TYPES = {'H': 'Uint16', 'I': 'Uint32'}
+
+
+def load_triples(db_file, standard_names):
+    """Distinct (canonical plant, family, species key, month) rows with a known family."""
+    conn = sqlite3.connect(db_file)
+    rows = set()
+    for plant, family, key, month in conn.execute("""
+            SELECT DISTINCT h.plant, s.family_ja, s.key, m.month
+            FROM host_edges h
+            JOIN species s ON s.key = h.species_key
+            JOIN emergence_months m ON m.wamei = s.wamei
+            WHERE s.family_ja != ''"""):
+        name = standard_plant_name(plant, standard_names)
+        if name:
+            rows.add((name, family, key, month))
+    species = dict(conn.execute('SELECT key, id || char(9) || wamei FROM species'))
+    conn.close()
+    return sorted(rows), species
+
+
+def _append_array(blob, layout, name, values):
+    """Append a typed array to blob at a 4-byte boundary and record its layout."""
+    blob.extend(b'\0' * (-len(blob) % 4))
+    if sys.byteorder != 'little':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    layout[name] = {'offset': len(blob), 'type': ARRAY_TYPES[values.typecode], 'length': len(values)}
+    blob.extend(values.tobytes())
+
+
+def build_phenology(db_file, output_file, meta_file, checklist_file=CHECKLIST_FILE,
+                    genus_mapping_file=GENUS_MAPPING_FILE):
+    """
+    Build the cube from the SQLite export and write the binary and JSON files.
+    """
+    rows, species_names = load_triples(db_file, load_standard_names(checklist_file, genus_mapping_file))
+
+    plants = sorted({plant for plant, _, _, _ in rows})
+    families = sorted({family for _, family, _, _ in rows})
+    species_keys = sorted({key for _, _, key, _ in rows})
+    plant_index = {plant: i for i, plant in enumerate(plants)}
+    family_index = {family: i for i, family in enumerate(families)}
+    species_index = {key: i for i, key in enumerate(species_keys)}
+
+    cell_count = len(plants) * MONTHS * len(families)
+    cells = [[] for _ in range(cell_count)]
+    for plant, family, key, month in rows:
+        cell = (plant_index[plant] * MONTHS + month - 1) * len(families) + family_index[family]
+        cells[cell].append(species_index[key])
+
+    counts = array.array('H', (min(len(members), 0xFFFF) for members in cells))
+    cell_offsets = array.array('I', [0])
+    species = array.array('H' if len(species_keys) <= 0xFFFF else 'I')
+    for members in cells:
+        species.extend(members)
+        cell_offsets.append(len(species))
+
+    blob = bytearray()
+    layout = {}
+    _append_array(blob, layout, 'counts', counts)
+    _append_array(blob, layout, 'cell_offsets', cell_offsets)
+    _append_array(blob, layout, 'species', species)
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, 'wb') as f:
+        f.write(blob)
+
+    meta = {
+        'binary': os.path.basename(output_file),
+        'shape': [len(plants), MONTHS, len(families)],
+        'arrays': layout,
+        'plants': plants,
+        'families': families,
+        'species': [species_names[key].split('\t', 1) for key in species_keys],
+    }
+    with open(meta_file, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"Phenology cube written to: {output_file} ({len(blob):,} bytes)")
+    print(f"   {len(plants)} plants × {MONTHS} months × {len(families)} families, "
+          f"{len(species)} species entries")
+
+    return meta
+
+
+def load_phenology(meta_file):
+    """Return (meta, arrays) with arrays decoded from the binary file."""
+    with open(meta_file, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    with open(os.path.join(os.path.dirname(meta_file), meta['binary']), 'rb') as f:
+        blob = f.read()
+
+    typecodes = {name: code for code, name in ARRAY_TYPES.items()}
+    arrays = {}
+    for name, spec in meta['arrays'].items():
+        values = array.array(typecodes[spec['type']])
+        values.frombytes(blob[spec['offset']:spec['offset'] + spec['length'] * values.itemsize])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        arrays[name] = values
+    return meta, arrays
+
+
+def plant_calendar(meta, arrays, plant):
+    """{month: {family: [(id, 和名), ...]}} for one plant, or None if it has no data."""
+    try:
+        p = meta['plants'].index(plant)
+    except ValueError:
+        return None
+
+    families = meta['families']
+    calendar = {}
+    for month in range(1, MONTHS + 1):
+        for f, family in enumerate(families):
+            cell = (p * MONTHS + month - 1) * len(families) + f
+            if arrays['counts'][cell]:
+                start, end = arrays['cell_offsets'][cell], arrays['cell_offsets'][cell + 1]
+                calendar.setdefault(month, {})[family] = [
+                    tuple(meta['species'][i]) for i in arrays['species'][start:end]]
+    return calendar
+
+
+if __name__ == "__main__":
+    db_file = os.path.join(ROOT, 'data', 'hostplants.sqlite')
+    output_file = os.path.join(ROOT, 'data', 'phenology.bin')
+    meta_file = os.path.join(ROOT, 'data', 'phenology.json')
+
+    if not os.path.exists(db_file):
+        print(f"{db_file} not found; run scripts/export_sqlite.py first")
+        sys.exit(1)
+
+    build_phenology(db_file, output_file, meta_file)
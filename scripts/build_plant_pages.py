@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Collapse the host-plant meta pages to one page per canonical plant.
+
+meta/plant/ has one page per raw host string, so the same plant appears as
+"コナラ", "-コナラ (ブナ科)", "コナラ(以上ブナ科)" and so on. Each host string
+(an existing page name, or a plant in host_edges of data/hostplants.sqlite)
+is mapped to a canonical plant:
+
+  1. NFKC-normalize it and tokenize it like the host column
+     (comprehensive_csv_cleaner.tokenize_plant_text) and take the first plant
+  2. look that name up in wamei_checklist_ver.1.10.csv; a synonym (all_name)
+     maps to its standard name (Hub name). Genus records ("カエデ属") are
+     known through genus_mapping.csv.
+  3. a name the checklist doesn't know ("サクラ類", "バラ科") is its own
+     canonical name as long as it reads like a name (katakana and kanji
+     only). Prose cut out of the host column ("広食性", "その他各種の広葉樹
+     につくという") is not a plant and gets no page.
+
+One page is written per canonical plant that has at least one moth. The
+pages link to the site's real paths (/assets/meta-styles.css, /moth/{id}).
+
+Every other page in meta/plant is replaced by a small redirect stub (meta
+refresh, rel=canonical, noindex) to its canonical plant, or to the top page
+when the old name named no plant, so existing URLs keep working. The same
+map is written to data/plant_redirects.json ({old name: canonical name or
+null}), merged with earlier runs. The /plant/ entries of sitemap.xml are
+replaced by one per canonical plant.
+
+The plant_pages step of scripts/pipeline.py runs this after the SQLite
+export; it can also be run on its own.
+
+Usage:
+    python scripts/build_plant_pages.py [--db PATH]
+"""
+
+import argparse
+import datetime
+import html
+import json
+import os
+import re
+import sqlite3
+import sys
+import unicodedata
+from collections import Counter, defaultdict
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from build_genus_mapping import CHECKLIST_FILE, GENUS_MAPPING_FILE, load_checklist_index, read_genus_mapping
+from comprehensive_csv_cleaner import tokenize_plant_text
+from records import iter_records
+
+SITE_URL = 'https://orau98.github.io'
+
+DEFAULT_DB = os.path.join(ROOT, 'data', 'hostplants.sqlite')
+PAGES_DIR = os.path.join(ROOT, 'meta', 'plant')
+PLANT_IMAGES_DIR = os.path.join(ROOT, 'images', 'plants')
+REDIRECTS_FILE = os.path.join(ROOT, 'data', 'plant_redirects.json')
+SITEMAP_FILE = os.path.join(ROOT, 'sitemap.xml')
+
+SCIENTIFIC_NAME = re.compile(r'^([A-Z][a-z]+(?: [a-z-]+){1,2})\s*(.*)$')
+# A host the checklist doesn't know is kept if it reads like a name...
+PLANT_TOKEN = re.compile(r'^[ァ-ヶー一-龯々]+$')
+# ...and isn't a note on the feeding habit
+NOT_PLANT = re.compile(r'食性|多食|^各|^(未知|一種|多数|仲間|寄主植物)$')
+
+
+def normalize(name):
+    return unicodedata.normalize('NFKC', name).strip()
+
+
+def load_standard_names(checklist_file=CHECKLIST_FILE, genus_mapping_file=GENUS_MAPPING_FILE):
+    """{name: standard name} of every known plant (checklist all_name -> Hub name, and genera)."""
+    standard = {normalize(genus): normalize(genus) for genus in read_genus_mapping(genus_mapping_file)}
+    for row in iter_records(checklist_file):
+        all_name = normalize(row.get('all_name'))
+        hub_name = normalize(row.get('Hub name'))
+        if not all_name or not hub_name:
+            continue
+        # "A/B" Hub names cover two taxa; keep the name that was asked for
+        if '/' in hub_name:
+            standard.setdefault(all_name, all_name if '/' not in all_name else hub_name.split('/')[0])
+            continue
+        standard.setdefault(all_name, hub_name)
+        standard.setdefault(hub_name, hub_name)
+    return standard
+
+
+def canonical_plant(host_string, standard_names):
+    """Canonical plant name of one host string, or None if it names no plant."""
+    tokens = tokenize_plant_text(normalize(host_string).lstrip('-・ '))
+    if not tokens:
+        return None
+    return standard_plant_name(tokens[0][0], standard_names)
+
+
+def standard_plant_name(plant, standard_names):
+    """Canonical name of one host_edges plant, or None for prose."""
+    plant = normalize(plant)
+    name = standard_names.get(plant)
+    if name is None and PLANT_TOKEN.match(plant) and not NOT_PLANT.search(plant):
+        name = plant
+    return name.replace('/', '／') if name else None
+
+
+def load_plant_species(db_file, standard_names):
+    """{canonical plant: (family, [species, ...])} for the moths in host_edges; prose is left out."""
+    species = defaultdict(list)
+    families = defaultdict(Counter)
+    seen = set()
+
+    conn = sqlite3.connect(db_file)
+    for species_id, wamei, scientific_name, plant, plant_family in conn.execute("""
+            SELECT s.page_id, s.wamei, s.scientific_name, h.plant, h.plant_family
+            FROM host_edges h JOIN species s ON s.key = h.species_key
+            WHERE s.source = 'master'
+            ORDER BY s.key"""):
+        name = standard_plant_name(plant, standard_names)
+        if name is None:
+            continue
+        if plant_family:
+            families[name][plant_family] += 1
+        if (name, species_id, wamei) not in seen:
+            seen.add((name, species_id, wamei))
+            species[name].append((species_id, wamei, scientific_name or ''))
+    conn.close()
+
+    return {name: (families[name].most_common(1)[0][0] if families[name] else '', members)
+            for name, members in species.items()}
+
+
+def plant_images(images_dir=PLANT_IMAGES_DIR):
+    """{plant: [file name, ...]} for images/plants/<plant>_<part>.<ext>."""
+    images = defaultdict(list)
+    if os.path.isdir(images_dir):
+        for filename in sorted(os.listdir(images_dir)):
+            stem, _ = os.path.splitext(filename)
+            plant, sep, _ = stem.partition('_')
+            if sep:
+                images[normalize(plant)].append(filename)
+    return images
+
+
+def _scientific_html(scientific_name):
+    match = SCIENTIFIC_NAME.match(scientific_name)
+    if not match:
+        return html.escape(scientific_name)
+    binomial, author = match.groups()
+    return f"<em>{html.escape(binomial)}</em> {html.escape(author)}".strip()
+
+
+def render_plant_page(name, family, species, images, aliases):
+    """HTML of one canonical plant page."""
+    count = len(species)
+    url = f"{SITE_URL}/plant/{quote(name)}"
+    label = f"{name} ({family})" if family else name
+    title = f"{name} - 食草図鑑 | {count}種の昆虫が利用"
+    names = [wamei for _, wamei, _ in species]
+    sample = '、'.join(names[:5]) + ('など' if count > 5 else '')
+    image_url = f"{SITE_URL}/images/plants/{quote(images[0])}" if images else ''
+
+    structured = {
+        '@context': 'https://schema.org',
+        '@type': ['Plant', 'Species'],
+        'name': name,
+        'identifier': {'@type': 'PropertyValue', 'propertyID': 'plant_name', 'value': name},
+        'description': f"{label}の食草植物情報。{count}種の昆虫がこの植物を食草として利用します。",
+        'url': url,
+        'inLanguage': 'ja',
+        'hasEcologicalInteraction': [
+            {'@type': 'EcologicalInteraction', 'interactionType': 'herbivory',
+             'participantOrganism': {'@type': ['Animal', 'Species'], 'name': wamei,
+                                     'scientificName': scientific_name}}
+            for _, wamei, scientific_name in species],
+        'author': {'@type': 'Organization', 'name': '昆虫食草図鑑'},
+        'publisher': {'@type': 'Organization', 'name': '昆虫と食草の図鑑'},
+    }
+    if image_url:
+        structured['image'] = image_url
+
+    e = html.escape
+    lines = [
+        '<!DOCTYPE html>',
+        '<html lang="ja">',
+        '<head>',
+        '  <meta charset="UTF-8">',
+        '  <meta name="viewport" content="width=device-width, initial-scale=1.0">',
+        f'  <title>{e(title)}</title>',
+        f'  <meta name="description" content="{e(label)}を食草とする{count}種の昆虫の詳細情報。">',
+        f'  <meta name="keywords" content="{e(",".join([name, "食草", "植物", "昆虫図鑑"] + names[:5]))}">',
+        f'  <link rel="canonical" href="{e(url)}">',
+        '  <link rel="stylesheet" href="/assets/meta-styles.css">',
+        '',
+        '  <!-- Open Graph -->',
+        f'  <meta property="og:title" content="{e(title)}">',
+        f'  <meta property="og:description" content="{e(label)}を食草とする昆虫: {e(sample)}">',
+        '  <meta property="og:type" content="article">',
+        f'  <meta property="og:url" content="{e(url)}">',
+    ]
+    if image_url:
+        lines.append(f'  <meta property="og:image" content="{e(image_url)}">')
+    lines += [
+        '  <meta property="og:site_name" content="昆虫と食草の図鑑">',
+        '',
+        '  <!-- Twitter Card -->',
+        '  <meta name="twitter:card" content="summary_large_image">',
+        f'  <meta property="twitter:title" content="{e(name)} - 食草図鑑">',
+        f'  <meta property="twitter:description" content="{e(label)}を食草とする{count}種の昆虫情報">',
+    ]
+    if image_url:
+        lines.append(f'  <meta property="twitter:image" content="{e(image_url)}">')
+    lines += [
+        '',
+        '  <script type="application/ld+json">',
+        json.dumps(structured, ensure_ascii=False, indent=2).replace('</', '<\\/'),
+        '  </script>',
+        '</head>',
+        '<body>',
+        '  <div class="meta-page">',
+        '    <nav class="breadcrumb">',
+        '      <a href="/">昆虫食草図鑑</a>',
+        '      <span>></span>',
+        '      <span>植物</span>',
+        '      <span>></span>',
+        f'      <span>{e(name)}</span>',
+        '    </nav>',
+        '',
+        '    <header class="meta-header">',
+        f'      <h1>{e(name)}</h1>',
+        '      <h2>食草植物の詳細情報</h2>',
+        '    </header>',
+        '',
+        '    <main class="meta-content">',
+        '      <section class="basic-info">',
+        '        <h3>基本情報</h3>',
+        '        <dl>',
+        '          <dt>植物名</dt>',
+        f'          <dd>{e(name)}</dd>',
+    ]
+    if family:
+        lines += ['          <dt>科名</dt>', f'          <dd>{e(family)}</dd>']
+    if aliases:
+        lines += ['          <dt>食草データでの表記</dt>', f'          <dd>{e("、".join(aliases))}</dd>']
+    lines += [
+        '          <dt>利用昆虫数</dt>',
+        f'          <dd>{count}種</dd>',
+        '          <dt>昆虫の種類</dt>',
+        f'          <dd>蛾: {count}種</dd>',
+        '        </dl>',
+        '      </section>',
+    ]
+    if images:
+        lines += [
+            '',
+            '      <section class="image-gallery">',
+            f'        <h3>{e(name)}の写真</h3>',
+            '        <div class="gallery-container">',
+        ]
+        for filename in images:
+            src = f"/images/plants/{quote(filename)}"
+            caption = os.path.splitext(filename)[0].replace('_', ' ')
+            lines += [
+                '          <div class="gallery-item">',
+                f'            <a href="{e(src)}" target="_blank" title="画像を拡大表示">',
+                f'              <img src="{e(src)}" alt="{e(name)}の写真 - {e(caption)}" loading="lazy">',
+                '            </a>',
+                f'            <div class="image-caption">{e(caption)}</div>',
+                '          </div>',
+            ]
+        lines += ['        </div>', '      </section>']
+    lines += [
+        '',
+        '      <section class="description">',
+        '        <h3>生態系での役割</h3>',
+        f'        <p>{e(name)}は、昆虫の食草として重要な役割を果たしている植物です。</p>',
+        f'        <p>この植物を食草として利用する昆虫は{count}種確認されています。'
+        f'{e(sample)}がこの植物を利用しています。</p>',
+        '      </section>',
+        '',
+        '      <section class="related-insects">',
+        f'        <h3>この植物を利用する昆虫（{count}種）</h3>',
+        f'        <h4>蛾（{count}種）</h4>',
+        '        <ul>',
+    ]
+    for species_id, wamei, scientific_name in species:
+        lines += [
+            '          <li>',
+            '            <div class="insect-name">',
+            f'              <a href="/moth/{quote(species_id)}">{e(wamei)}</a>',
+            '            </div>',
+            f'            <div class="insect-scientific">{_scientific_html(scientific_name)}</div>',
+            '          </li>',
+        ]
+    lines += [
+        '        </ul>',
+        '      </section>',
+        '    </main>',
+        '',
+        '    <section class="navigation">',
+        '      <a href="/" class="back-link">図鑑トップへ</a>',
+        '    </section>',
+        '  </div>',
+        '</body>',
+        '</html>',
+        '',
+    ]
+    return '\n'.join(lines)
+
+
+def render_redirect_stub(old_name, target):
+    """HTML of a page that now redirects to target's page (the top page if target is None)."""
+    e = html.escape
+    if target:
+        href = f"{quote(target)}.html"
+        url = f"{SITE_URL}/plant/{quote(target)}"
+        label = f"{target}のページに移動しました。"
+    else:
+        href = url = f"{SITE_URL}/"
+        label = f"「{old_name}」のページは廃止しました。"
+    return '\n'.join([
+        '<!DOCTYPE html>',
+        '<html lang="ja">',
+        '<head>',
+        '  <meta charset="UTF-8">',
+        f'  <title>{e(target or old_name)} - 食草図鑑</title>',
+        '  <meta name="robots" content="noindex">',
+        f'  <link rel="canonical" href="{e(url)}">',
+        f'  <meta http-equiv="refresh" content="0; url={e(href)}">',
+        '</head>',
+        '<body>',
+        f'  <p>{e(label)} <a href="{e(href)}">{e(target or "昆虫食草図鑑")}</a></p>',
+        '</body>',
+        '</html>',
+        '',
+    ])
+
+
+def update_sitemap(names, sitemap_file=SITEMAP_FILE, lastmod=None):
+    """
+    Replace the /plant/ entries of sitemap.xml with one per canonical plant.
+
+    The file is rewritten with real line breaks (it had literal "\\n"
+    sequences, which made it unreadable XML). Returns the number of entries
+    removed.
+    """
+    if not os.path.exists(sitemap_file):
+        return 0
+    lastmod = lastmod or datetime.date.today().isoformat()
+    with open(sitemap_file, 'r', encoding='utf-8') as f:
+        text = f.read().replace('\\n', '\n')
+
+    plant_entry = re.compile(r'[ \t]*<url>\s*<loc>' + re.escape(SITE_URL) + r'/plant/.*?</url>\s*\n?', re.S)
+    text, removed = plant_entry.subn('', text)
+
+    entries = ''.join(
+        f"  <url>\n    <loc>{SITE_URL}/plant/{quote(name)}</loc>\n    <lastmod>{lastmod}</lastmod>\n"
+        f"    <changefreq>monthly</changefreq>\n    <priority>0.7</priority>\n  </url>\n"
+        for name in sorted(names))
+    end = text.rindex('</urlset>')
+    text = text[:end] + entries + text[end:]
+
+    with open(sitemap_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return removed
+
+
+def load_redirects(redirects_file=REDIRECTS_FILE):
+    try:
+        with open(redirects_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def build_plant_pages(db_file=DEFAULT_DB, pages_dir=PAGES_DIR, redirects_file=REDIRECTS_FILE,
+                      checklist_file=CHECKLIST_FILE, sitemap_file=SITEMAP_FILE,
+                      genus_mapping_file=GENUS_MAPPING_FILE, images_dir=PLANT_IMAGES_DIR):
+    """
+    Write one page per canonical plant, redirect stubs for the other names and the sitemap entries.
+    """
+    standard_names = load_standard_names(checklist_file, genus_mapping_file)
+    checklist_families = load_checklist_index(checklist_file)
+    plants = load_plant_species(db_file, standard_names)
+    images = plant_images(images_dir)
+
+    old_names = sorted(filename[:-5] for filename in os.listdir(pages_dir) if filename.endswith('.html')) \
+        if os.path.isdir(pages_dir) else []
+
+    aliases = defaultdict(set)
+    canonical = {}
+    for old_name in old_names:
+        name = canonical_plant(old_name, standard_names)
+        canonical[old_name] = name if name in plants else None
+        if canonical[old_name] and old_name != name:
+            aliases[name].add(old_name)
+
+    os.makedirs(pages_dir, exist_ok=True)
+    for name, (family, species) in sorted(plants.items()):
+        family = family or checklist_families.get(name, '')
+        page = render_plant_page(name, family, species, images.get(name, []), sorted(aliases[name]))
+        with open(os.path.join(pages_dir, f"{name}.html"), 'w', encoding='utf-8') as f:
+            f.write(page)
+
+    # Merge with earlier runs, then follow chains so every old name points at a live page
+    redirects = load_redirects(redirects_file)
+    for old_name, name in canonical.items():
+        if old_name != name:
+            redirects[old_name] = name
+    for old_name in list(redirects):
+        if old_name in plants:
+            del redirects[old_name]
+            continue
+        target, hops = redirects[old_name], 0
+        while target is not None and target not in plants and target in redirects and hops < 10:
+            target, hops = redirects[target], hops + 1
+        redirects[old_name] = target if target in plants else None
+
+    os.makedirs(os.path.dirname(redirects_file), exist_ok=True)
+    with open(redirects_file, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(redirects.items())), f, ensure_ascii=False, indent=1)
+
+    stubs = 0
+    for old_name in old_names:
+        if old_name not in plants:
+            with open(os.path.join(pages_dir, f"{old_name}.html"), 'w', encoding='utf-8') as f:
+                f.write(render_redirect_stub(old_name, redirects.get(old_name)))
+            stubs += 1
+
+    removed = update_sitemap(plants, sitemap_file)
+
+    gone = sum(1 for target in redirects.values() if target is None)
+    print(f"Plant pages written to: {pages_dir}")
+    print(f"   {len(old_names)} existing pages -> {len(plants)} plant pages + {stubs} redirect stubs")
+    print(f"   {len(redirects)} redirects ({gone} without a plant) in {redirects_file}")
+    print(f"   sitemap: {removed} plant entries replaced by {len(plants)}")
+
+    return plants, redirects
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write one meta page per canonical host plant.")
+    parser.add_argument('--db', default=DEFAULT_DB, help="SQLite file from export_sqlite.py")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"{args.db} not found; run scripts/export_sqlite.py first")
+        sys.exit(1)
+
+    build_plant_pages(args.db)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Precompute the top-k related species for every master catalog entry.
+
+Signals, combined into one score:
+  - shared host plants: Jaccard similarity of the host sets in host_edges
+    (data/hostplants.sqlite, from export_sqlite.py)
+  - same genus (属名)
+  - the declared 類似種, "[nr <種小名> <author>]", resolved within the genus
+
+Candidates come from inverted indexes (plant -> species, genus -> species),
+so only species sharing at least one signal are ever compared.
+
+Output, data/related_species.json, is indexed by master data row:
+  ids     - species id of each row (catalog-N / main-N, unique as in the
+            family shards)
+  related - for each row, the related row numbers, best first
+  reasons - for each row, a bit mask per related row (1 host, 2 genus, 4 類似種)
+"""
+
+import heapq
+import json
+import os
+import re
+import sqlite3
+import sys
+from collections import defaultdict
+
+from build_family_shards import unique_species_ids
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from records import iter_rows
+
+TOP_K = 8
+
+HOST_WEIGHT = 1.0
+GENUS_WEIGHT = 0.3
+DECLARED_WEIGHT = 1.0
+
+REASON_HOST = 1
+REASON_GENUS = 2
+REASON_DECLARED = 4
+
+# Plants shared by more species than this say little about relatedness
+MAX_PLANT_SPECIES = 500
+
+DECLARED_PATTERN = re.compile(r'\[\s*nr\s+([a-z-]+)')
+
+
+def load_master(master_file):
+    """Return (ids, genus per row, declared 種小名 per row, (属名, 種小名) -> rows)."""
+    genera = []
+    declared = []
+    by_name = defaultdict(list)
+
+    rows = iter_rows(master_file)
+    header = next(rows)
+    genus_idx = header.index('属名')
+    epithet_idx = header.index('種小名')
+    similar_idx = header.index('類似種')
+    rows = [row + [''] * (len(header) - len(row)) for row in rows]
+    ids, _ = unique_species_ids(rows)
+
+    for index, row in enumerate(rows):
+        genus = row[genus_idx].strip()
+        epithet = row[epithet_idx].strip()
+        match = DECLARED_PATTERN.search(row[similar_idx])
+
+        genera.append(genus)
+        declared.append(match.group(1) if match else '')
+        if genus and epithet:
+            by_name[(genus, epithet)].append(index)
+
+    return ids, genera, declared, by_name
+
+
+def load_hosts(db_file):
+    """Host plant sets of the master rows, from the SQLite host_edges table."""
+    hosts = defaultdict(set)
+    conn = sqlite3.connect(db_file)
+    for row, plant in conn.execute("""
+            SELECT s.source_row, h.plant
+            FROM host_edges h JOIN species s ON s.key = h.species_key
+            WHERE s.source = 'master'"""):
+        hosts[row].add(plant)
+    conn.close()
+    return hosts
+
+
+def build_related_species(master_file, db_file, output_file, top_k=TOP_K):
+    """
+    Score related species through the inverted indexes and write the top k.
+    """
+    ids, genera, declared, by_name = load_master(master_file)
+    hosts = load_hosts(db_file)
+
+    by_plant = defaultdict(list)
+    for row, plants in hosts.items():
+        for plant in plants:
+            by_plant[plant].append(row)
+
+    by_genus = defaultdict(list)
+    for row, genus in enumerate(genera):
+        if genus:
+            by_genus[genus].append(row)
+
+    related = []
+    reasons = []
+    for row in range(len(ids)):
+        shared = defaultdict(int)
+        for plant in hosts.get(row, ()):
+            postings = by_plant[plant]
+            if len(postings) > MAX_PLANT_SPECIES:
+                continue
+            for other in postings:
+                shared[other] += 1
+
+        candidates = {}
+        host_count = len(hosts.get(row, ()))
+        for other, count in shared.items():
+            if other != row:
+                jaccard = count / (host_count + len(hosts[other]) - count)
+                candidates[other] = [HOST_WEIGHT * jaccard, REASON_HOST]
+
+        for other in by_genus.get(genera[row], ()):
+            if other != row:
+                entry = candidates.setdefault(other, [0.0, 0])
+                entry[0] += GENUS_WEIGHT
+                entry[1] |= REASON_GENUS
+
+        if declared[row]:
+            for other in by_name.get((genera[row], declared[row]), ()):
+                if other != row:
+                    entry = candidates.setdefault(other, [0.0, 0])
+                    entry[0] += DECLARED_WEIGHT
+                    entry[1] |= REASON_DECLARED
+
+        # Ties go to the lower row number, i.e. checklist order
+        best = heapq.nsmallest(top_k, candidates.items(), key=lambda item: (-item[1][0], item[0]))
+        related.append([other for other, _ in best])
+        reasons.append([entry[1] for _, entry in best])
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({'k': top_k, 'ids': ids, 'related': related, 'reasons': reasons},
+                  f, ensure_ascii=False, separators=(',', ':'))
+
+    linked = sum(1 for entries in related if entries)
+    print(f"Related species written to: {output_file}")
+    print(f"   {linked} of {len(ids)} species have related species")
+
+    return related
+
+
+def load_related_species(related_file):
+    """Return {species id: [(related id, reason bits), ...]} for page generation."""
+    with open(related_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    ids = data['ids']
+    result = {}
+    for row, (entries, bits) in enumerate(zip(data['related'], data['reasons'])):
+        result.setdefault(ids[row], [(ids[other], reason) for other, reason in zip(entries, bits)])
+    return result
+
+
+if __name__ == "__main__":
+    master_file = os.path.join(ROOT, 'ListMJ_hostplants_master.csv')
+    db_file = os.path.join(ROOT, 'data', 'hostplants.sqlite')
+    output_file = os.path.join(ROOT, 'data', 'related_species.json')
+
+    if not os.path.exists(db_file):
+        print(f"{db_file} not found; run scripts/export_sqlite.py first")
+        sys.exit(1)
+
+    build_related_species(master_file, db_file, output_file)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Build the taxonomy tree used by the browse-by-taxonomy view.
+
+Reads the 科名/亜科名/族名/亜族名/属名/亜属名 columns of
+ListMJ_hostplants_master.csv and hamushi_species_integrated.csv. Host plants
+come from host_edges in data/hostplants.sqlite (from export_sqlite.py).
+Empty ranks are skipped, so a genus with no tribe hangs directly off its
+subfamily. Siblings keep the order they first appear in, which is checklist
+(taxonomic) order.
+
+Output, data/taxonomy.json, stores the nodes column-wise in breadth-first
+order. Node ids are positions in these arrays, and node 0 is the root.
+  rank, name, name_ja, species, hosts  - one value per node
+  children - offsets, length nodes + 1: the children of node i are
+             children[i] .. children[i + 1] - 1
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from records import iter_rows
+
+# (rank, scientific name column, Japanese name column). By position, since
+# the master CSV names both 亜族 columns 亜族名.
+LEVELS = [
+    ('科', 1, 2),
+    ('亜科', 3, 4),
+    ('族', 5, 6),
+    ('亜族', 7, 8),
+    ('属', 9, None),
+    ('亜属', 10, None),
+]
+
+SOURCES = [
+    ('master', 'ListMJ_hostplants_master.csv'),
+    ('hamushi', 'hamushi_species_integrated.csv'),
+]
+
+
+class _Node:
+    __slots__ = ('rank', 'name', 'names_ja', 'children', 'species', 'hosts')
+
+    def __init__(self, rank, name):
+        self.rank = rank
+        self.name = name
+        self.names_ja = Counter()
+        self.children = {}
+        self.species = 0
+        self.hosts = set()
+
+
+def load_hosts(db_file):
+    """{(source, data row): set of host plants} from the SQLite export."""
+    hosts = defaultdict(set)
+    conn = sqlite3.connect(db_file)
+    for source, row, plant in conn.execute("""
+            SELECT s.source, s.source_row, h.plant
+            FROM host_edges h JOIN species s ON s.key = h.species_key
+            WHERE s.source IN ('master', 'hamushi')"""):
+        hosts[(source, row)].add(plant)
+    conn.close()
+    return hosts
+
+
+def build_taxonomy(db_file, output_file, sources=None):
+    """
+    Group every species row into the tree and write the flattened result.
+    """
+    if sources is None:
+        sources = [(source, os.path.join(ROOT, csv_file)) for source, csv_file in SOURCES]
+    hosts = load_hosts(db_file)
+
+    root = _Node('root', '')
+    for source, csv_file in sources:
+        rows = iter_rows(csv_file)
+        next(rows, None)
+        for index, row in enumerate(rows):
+            row_hosts = hosts.get((source, index), set())
+            node = root
+            node.species += 1
+            node.hosts |= row_hosts
+            for rank, name_col, ja_col in LEVELS:
+                name = row[name_col].strip() if name_col < len(row) else ''
+                if not name:
+                    continue
+                child = node.children.get(name)
+                if child is None:
+                    child = node.children[name] = _Node(rank, name)
+                if ja_col is not None and ja_col < len(row) and row[ja_col].strip():
+                    child.names_ja[row[ja_col].strip()] += 1
+                child.species += 1
+                child.hosts |= row_hosts
+                node = child
+
+    # Breadth-first, so each node's children are one contiguous run
+    order = [root]
+    children = []
+    for node in order:
+        children.append(len(order))
+        order.extend(node.children.values())
+    children.append(len(order))
+
+    tree = {
+        'ranks': [rank for rank, _, _ in LEVELS],
+        'rank': [node.rank for node in order],
+        'name': [node.name for node in order],
+        'name_ja': [node.names_ja.most_common(1)[0][0] if node.names_ja else '' for node in order],
+        'species': [node.species for node in order],
+        'hosts': [len(node.hosts) for node in order],
+        'children': children,
+    }
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(tree, f, ensure_ascii=False, separators=(',', ':'))
+
+    by_rank = Counter(node.rank for node in order[1:])
+    print(f"Taxonomy tree written to: {output_file}")
+    print(f"   {len(order) - 1} nodes: " + ', '.join(f"{rank} {by_rank[rank]}" for rank, _, _ in LEVELS))
+    print(f"   {root.species} species, {len(root.hosts)} host plants")
+
+    return tree
+
+
+if __name__ == "__main__":
+    db_file = os.path.join(ROOT, 'data', 'hostplants.sqlite')
+    output_file = os.path.join(ROOT, 'data', 'taxonomy.json')
+
+    if not os.path.exists(db_file):
+        print(f"{db_file} not found; run scripts/export_sqlite.py first")
+        sys.exit(1)
+
+    build_taxonomy(db_file, output_file)
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Check internal links and assets of the generated site before deploy.
+
+Parses every HTML page (index.html, the policy pages, 404.html and all of
+meta/) in parallel worker processes, plus every <loc> in sitemap.xml. Each
+internal reference, whether canonical, og:url, stylesheet, script, icon,
+img, og:image, twitter:image or a link, is resolved against the output
+directory:
+
+  - a path is fine if the file exists (directories via index.html, and
+    extensionless paths via .html, as GitHub Pages serves them)
+  - an app route (/moth/{id}, /plant/{name}, ...) is fine if meta/ has a
+    prerendered page for it, or, for moths, if the id is a catalog id
+    (catalog-N / main-N) from ListMJ_hostplants_master.csv
+
+Broken targets are grouped with the pages that reference them. When a
+broken path exists once the old project prefix (/insects-host-plant-explorer-)
+is dropped, or with images/moths read as images/insects, a hint says so.
+
+Exits with status 1 if anything is broken.
+
+Usage:
+    python scripts/check_links.py [--root DIR] [--jobs N] [--samples N] [--json PATH]
+"""
+
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote, urljoin, urlsplit
+
+from build_family_shards import species_id
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from records import iter_rows
+
+SITE_URL = 'https://orau98.github.io'
+
+TOP_LEVEL_PAGES = ['index.html', '404.html', 'privacy-policy.html', 'terms-of-service.html']
+SITEMAP_FILES = ['sitemap.xml']
+
+# Client-side routes of the app (see the router in assets/index-*.js)
+ROUTE_KINDS = ('moth', 'plant', 'beetle', 'butterfly', 'leafbeetle')
+
+# Rewrites tried on a broken path, only to suggest where the target really is
+HINT_REWRITES = [
+    ('/insects-host-plant-explorer-/', '/'),
+    ('/images/moths/', '/images/insects/'),
+]
+
+SKIP_DIRS = {'.git', 'node_modules', '__pycache__'}
+
+META_REFERENCES = {
+    'og:url': 'canonical',
+    'og:image': 'image',
+    'twitter:image': 'image',
+}
+
+
+# Tags are found with regular expressions rather than html.parser, which is
+# about 4x slower on these pages. Comments and script bodies (JSON-LD, inline
+# JS) are blanked first so markup inside them is not mistaken for tags.
+SKIPPED_MARKUP = re.compile(r'<!--.*?-->|(<script\b[^>]*>).*?</script\s*>', re.S | re.I)
+TAG_PATTERN = re.compile(r'<(link|meta|img|script|a)\b([^>]*)>', re.I)
+ATTRIBUTE_PATTERN = re.compile(r'''([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''')
+
+
+def _references(tag, attrs):
+    """The (kind, url) references one tag makes."""
+    if tag == 'link' and attrs.get('href'):
+        rel = attrs.get('rel', '').lower().split()
+        if 'canonical' in rel:
+            return [('canonical', attrs['href'])]
+        if 'stylesheet' in rel:
+            return [('stylesheet', attrs['href'])]
+        if 'icon' in rel or 'apple-touch-icon' in rel or 'manifest' in rel:
+            return [('icon', attrs['href'])]
+    elif tag == 'meta' and attrs.get('content'):
+        kind = META_REFERENCES.get(attrs.get('property') or attrs.get('name'))
+        if kind:
+            return [(kind, attrs['content'])]
+    elif tag == 'img' and attrs.get('src'):
+        return [('image', attrs['src'])]
+    elif tag == 'script' and attrs.get('src'):
+        return [('script', attrs['src'])]
+    elif tag == 'a' and attrs.get('href'):
+        return [('link', attrs['href'])]
+    return []
+
+
+def parse_page(task):
+    """Return (page, references) for one HTML file. Runs in a worker."""
+    root, relpath = task
+    with open(os.path.join(root, relpath), 'r', encoding='utf-8', errors='replace') as f:
+        text = SKIPPED_MARKUP.sub(lambda match: match.group(1) or '', f.read())
+
+    references = []
+    for match in TAG_PATTERN.finditer(text):
+        attrs = {name.lower(): html.unescape(double or single or bare)
+                 for name, double, single, bare in ATTRIBUTE_PATTERN.findall(match.group(2))}
+        references.extend(_references(match.group(1).lower(), attrs))
+    return relpath, references
+
+
+def find_pages(root):
+    pages = [page for page in TOP_LEVEL_PAGES if os.path.exists(os.path.join(root, page))]
+    for dirpath, dirnames, filenames in os.walk(os.path.join(root, 'meta')):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.html'):
+                pages.append(os.path.relpath(os.path.join(dirpath, filename), root))
+    return pages
+
+
+def list_files(root):
+    """Every file under root, as site paths ("assets/app.js")."""
+    files = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS and not name.startswith('.')]
+        relative = os.path.relpath(dirpath, root)
+        for filename in filenames:
+            files.add(filename if relative == '.' else f"{relative}/{filename}".replace(os.sep, '/'))
+    return files
+
+
+def load_route_ids(root):
+    """Known ids of routes that have no prerendered page, by route kind."""
+    route_ids = defaultdict(set)
+    master_file = os.path.join(root, 'ListMJ_hostplants_master.csv')
+    if os.path.exists(master_file):
+        rows = iter_rows(master_file)
+        next(rows, None)
+        route_ids['moth'].update(species_id(row, index) for index, row in enumerate(rows))
+    return route_ids
+
+
+class Resolver:
+    """Resolves site URLs against the output directory, memoizing each path."""
+
+    def __init__(self, root, site_url=SITE_URL):
+        self.site = urlsplit(site_url)
+        self.files = list_files(root)
+        self.route_ids = load_route_ids(root)
+        self._memo = {}
+
+    def site_path(self, url, base_path='/'):
+        """The path of url on this site, or None for external and non-HTTP URLs."""
+        url = url.strip()
+        if not url or url.startswith(('#', 'mailto:', 'tel:', 'javascript:', 'data:')):
+            return None
+        parts = urlsplit(urljoin(f"{self.site.scheme}://{self.site.netloc}{base_path}", url))
+        if parts.scheme not in ('http', 'https') or parts.netloc != self.site.netloc:
+            return None
+        return unquote(parts.path) or '/'
+
+    def exists(self, path):
+        """True if path is served by a file or is a known app route."""
+        found = self._memo.get(path)
+        if found is None:
+            found = self._memo[path] = self._exists(path)
+        return found
+
+    def _exists(self, path):
+        relative = path.lstrip('/')
+        if relative in self.files or (relative.rstrip('/') + '/index.html').lstrip('/') in self.files:
+            return True
+        if not path.endswith('/') and relative + '.html' in self.files:
+            return True
+
+        segments = relative.rstrip('/').split('/')
+        if len(segments) == 2 and segments[0] in ROUTE_KINDS:
+            kind, route_id = segments
+            return f"meta/{kind}/{route_id}.html" in self.files or route_id in self.route_ids[kind]
+        return False
+
+    def hint(self, path):
+        for old, new in HINT_REWRITES:
+            if old in path:
+                rewritten = path.replace(old, new, 1)
+                if self.exists(rewritten):
+                    return rewritten
+        return None
+
+
+def read_sitemap(path):
+    """Return (urls, problems) for one sitemap file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    problems = []
+    if '\\n' in text:
+        problems.append(r'contains literal "\n" sequences instead of newlines')
+    try:
+        ElementTree.fromstring(text.encode('utf-8'))
+    except ElementTree.ParseError as e:
+        problems.append(f"is not well-formed XML: {e}")
+    urls = [html.unescape(url.strip()) for url in re.findall(r'<loc>(.*?)</loc>', text, re.S)]
+    return urls, problems
+
+
+def check_links(root=ROOT, jobs=None, samples=3, report_file=None, site_url=SITE_URL):
+    """
+    Check every page and sitemap entry; print the broken targets and return them.
+    """
+    start = time.perf_counter()
+    resolver = Resolver(root, site_url)
+    pages = find_pages(root)
+
+    # Per broken path: kind of its first reference, reference count, referring pages in order
+    broken = defaultdict(lambda: {'kind': None, 'count': 0, 'pages': {}})
+    checked = 0
+
+    def check(kind, url, source, base_path='/'):
+        nonlocal checked
+        path = resolver.site_path(url, base_path)
+        if path is None:
+            return
+        checked += 1
+        if not resolver.exists(path):
+            entry = broken[path]
+            entry['kind'] = entry['kind'] or kind
+            entry['count'] += 1
+            entry['pages'][source] = None
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        tasks = [(root, page) for page in pages]
+        for page, references in executor.map(parse_page, tasks, chunksize=64):
+            base_path = '/' + page.replace(os.sep, '/')
+            for kind, url in references:
+                check(kind, url, page, base_path)
+
+    sitemap_problems = []
+    sitemap_urls = 0
+    for sitemap in SITEMAP_FILES:
+        path = os.path.join(root, sitemap)
+        if not os.path.exists(path):
+            continue
+        urls, problems = read_sitemap(path)
+        sitemap_problems.extend(f"{sitemap} {problem}" for problem in problems)
+        sitemap_urls += len(urls)
+        for url in urls:
+            check('sitemap', url, sitemap)
+
+    elapsed = time.perf_counter() - start
+    references = sum(entry['count'] for entry in broken.values())
+    print(f"Checked {checked:,} references from {len(pages):,} pages and {sitemap_urls:,} sitemap URLs "
+          f"in {elapsed:.2f}s")
+
+    for problem in sitemap_problems:
+        print(f"   ✗ {problem}")
+
+    if not broken:
+        print("   no broken targets")
+    else:
+        print(f"   {len(broken):,} broken targets ({references:,} references)\n")
+        by_kind = defaultdict(list)
+        for path, entry in broken.items():
+            by_kind[entry['kind']].append((path, entry))
+        for kind, entries in sorted(by_kind.items()):
+            entries.sort(key=lambda item: (-item[1]['count'], item[0]))
+            print(f"   [{kind}] {len(entries):,} targets")
+            for path, entry in entries[:samples]:
+                hint = resolver.hint(path)
+                suffix = f" (exists as {hint})" if hint else ''
+                print(f"     {path}{suffix}")
+                print(f"       referenced {entry['count']:,}x from {len(entry['pages']):,} pages, "
+                      f"e.g. {', '.join(list(entry['pages'])[:2])}")
+            if len(entries) > samples:
+                print(f"     ... and {len(entries) - samples:,} more")
+
+    if report_file:
+        report = {
+            'pages': len(pages),
+            'references': checked,
+            'sitemap_problems': sitemap_problems,
+            'broken': {path: {'kind': entry['kind'], 'hint': resolver.hint(path), 'count': entry['count'],
+                              'pages': list(entry['pages'])}
+                       for path, entry in sorted(broken.items())},
+        }
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"\nFull report written to: {report_file}")
+
+    return dict(broken), sitemap_problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check internal links and assets of the generated site.")
+    parser.add_argument('--root', default=ROOT, help="output directory to check")
+    parser.add_argument('--jobs', type=int, default=None, help="parallel worker processes")
+    parser.add_argument('--samples', type=int, default=3, help="broken targets to list per kind")
+    parser.add_argument('--json', metavar='PATH', help="write every broken target and its pages to PATH")
+    args = parser.parse_args()
+
+    broken, problems = check_links(args.root, args.jobs, args.samples, args.json)
+    sys.exit(1 if broken or problems else 0)
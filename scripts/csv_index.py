@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Byte-offset sidecar indexes for random access into the large CSVs.
+
+build_csv_index() scans a CSV once and writes <csv>.idx.sqlite, a small
+SQLite file with the byte offset of every record (row_offsets) and a
+(column, key) -> offset table for the chosen columns (key_offsets, keyed by
+its primary key). A lookup opens the sidecar and does one indexed SELECT,
+so it reads a few pages instead of loading the whole index; the row-number
+table is only touched by row(). IndexedCsv mmaps the CSV and parses only
+the records a lookup asks for, so "catalog No 4521" no longer means reading
+ListMJ_hostplants_master.csv from the top. The sidecar records the CSV's
+size and mtime and is rebuilt when either changes.
+
+Usage:
+    python scripts/csv_index.py ListMJ_hostplants_master.csv 大図鑑カタログNo 4521
+    python scripts/csv_index.py wamei_checklist_ver.1.10.csv "Hub name" コナラ
+"""
+
+import csv
+import json
+import mmap
+import os
+import sqlite3
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Key columns indexed for each known file
+KEY_COLUMNS = {
+    'ListMJ_hostplants_master.csv': ['大図鑑カタログNo', '和名'],
+    'hamushi_species_integrated.csv': ['大図鑑カタログNo', '和名'],
+    'wamei_checklist_ver.1.10.csv': ['Hub name', 'all_name'],
+}
+
+INDEX_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE row_offsets (number INTEGER PRIMARY KEY, pos INTEGER NOT NULL);
+CREATE TABLE key_offsets (
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    PRIMARY KEY (name, value, pos)
+) WITHOUT ROWID;
+"""
+
+
+def index_path(csv_file):
+    return csv_file + '.idx.sqlite'
+
+
+def _decode(record):
+    return next(csv.reader([record.decode('utf-8-sig')]))
+
+
+def iter_records(data, offset=0):
+    """
+    Yield (offset, record bytes) for each CSV record in data from offset on.
+
+    A record ends at a newline outside double quotes, so quoted fields that
+    contain newlines stay in one record.
+    """
+    size = len(data)
+    while offset < size:
+        end = offset
+        quotes = 0
+        while True:
+            newline = data.find(b'\n', end)
+            if newline == -1:
+                newline = size
+            quotes += data[end:newline].count(b'"')
+            end = newline + 1
+            if quotes % 2 == 0 or end >= size:
+                break
+        record = data[offset:min(end, size)].rstrip(b'\r\n')
+        if record:
+            yield offset, record
+        offset = end
+
+
+def build_csv_index(csv_file, key_columns=None, output_file=None):
+    """
+    Scan csv_file and write its offset index. Returns the number of rows.
+    """
+    if key_columns is None:
+        key_columns = KEY_COLUMNS.get(os.path.basename(csv_file), [])
+    output_file = output_file or index_path(csv_file)
+    tmp_file = output_file + '.tmp'
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+    stat = os.stat(csv_file)
+    conn = sqlite3.connect(tmp_file)
+    conn.executescript(SCHEMA)
+    with open(csv_file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            records = iter_records(data)
+            _, header_record = next(records)
+            header = _decode(header_record)
+            positions = [header.index(column) for column in key_columns]
+
+            rows = []
+            keys = []
+            for offset, record in records:
+                rows.append((len(rows), offset))
+                row = _decode(record)
+                for column, position in zip(key_columns, positions):
+                    key = row[position].strip() if position < len(row) else ''
+                    if key:
+                        keys.append((column, key, offset))
+
+    conn.executemany('INSERT INTO row_offsets VALUES (?, ?)', rows)
+    conn.executemany('INSERT OR IGNORE INTO key_offsets VALUES (?, ?, ?)', keys)
+    conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+        ('version', str(INDEX_VERSION)),
+        ('size', str(stat.st_size)),
+        ('mtime_ns', str(stat.st_mtime_ns)),
+        ('rows', str(len(rows))),
+        ('header', json.dumps(header, ensure_ascii=False)),
+        ('columns', json.dumps(key_columns, ensure_ascii=False)),
+    ])
+    conn.commit()
+    conn.close()
+    os.replace(tmp_file, output_file)
+
+    print(f"Indexed {len(rows)} rows of {os.path.basename(csv_file)} by {', '.join(key_columns) or 'row number'}")
+
+    return len(rows)
+
+
+def _open_index(csv_file, key_columns):
+    """(connection, meta) for an up-to-date sidecar, or (None, None)."""
+    path = index_path(csv_file)
+    if not os.path.exists(path):
+        return None, None
+
+    stat = os.stat(csv_file)
+    conn = sqlite3.connect(path)
+    try:
+        meta = dict(conn.execute('SELECT name, value FROM meta'))
+        columns = json.loads(meta['columns'])
+        if (meta['version'] == str(INDEX_VERSION)
+                and meta['size'] == str(stat.st_size)
+                and meta['mtime_ns'] == str(stat.st_mtime_ns)
+                and all(column in columns for column in key_columns or [])):
+            return conn, {'header': json.loads(meta['header']), 'columns': columns, 'rows': int(meta['rows'])}
+    except (sqlite3.DatabaseError, KeyError, ValueError):
+        pass
+    conn.close()
+    return None, None
+
+
+def load_csv_index(csv_file, key_columns=None):
+    """
+    Open the sidecar index, rebuilding it if the CSV has changed.
+
+    Returns (connection, meta) where meta has the header, the indexed
+    columns and the row count.
+    """
+    conn, meta = _open_index(csv_file, key_columns)
+    if conn is None:
+        build_csv_index(csv_file, key_columns)
+        conn, meta = _open_index(csv_file, key_columns)
+    return conn, meta
+
+
+class IndexedCsv:
+    """
+    Random access to the records of a CSV through its offset index.
+
+    Rows are returned as dicts, like csv.DictReader (a repeated header name
+    keeps the value of its last column).
+    """
+
+    def __init__(self, csv_file, key_columns=None):
+        self.csv_file = csv_file
+        self._index, meta = load_csv_index(csv_file, key_columns)
+        self.header = meta['header']
+        self.columns = meta['columns']
+        self._rows = meta['rows']
+        self._file = open(csv_file, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._index.close()
+        self._data.close()
+        self._file.close()
+
+    def __len__(self):
+        return self._rows
+
+    def _read(self, offset):
+        _, record = next(iter_records(self._data, offset))
+        return dict(zip(self.header, _decode(record)))
+
+    def _offsets(self, column, key):
+        if column not in self.columns:
+            raise KeyError(column)
+        return [pos for (pos,) in self._index.execute(
+            'SELECT pos FROM key_offsets WHERE name = ? AND value = ? ORDER BY pos', (column, key))]
+
+    def row(self, number):
+        """The data row at a 0-based position (the N of "main-N")."""
+        found = self._index.execute('SELECT pos FROM row_offsets WHERE number = ?',
+                                    (number if number >= 0 else self._rows + number,)).fetchone()
+        if found is None:
+            raise IndexError(number)
+        return self._read(found[0])
+
+    def get(self, column, key):
+        """Every row whose column equals key."""
+        return [self._read(offset) for offset in self._offsets(column, key)]
+
+    def get_many(self, column, keys):
+        """Rows for several keys, read in file order."""
+        offsets = sorted({offset for key in keys for offset in self._offsets(column, key)})
+        return [self._read(offset) for offset in offsets]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print(__doc__.strip().split('Usage:')[1])
+        sys.exit(2)
+
+    csv_file, column, key = sys.argv[1:]
+    if not os.path.isabs(csv_file) and not os.path.exists(csv_file):
+        csv_file = os.path.join(ROOT, csv_file)
+
+    key_columns = KEY_COLUMNS.get(os.path.basename(csv_file), [])
+    if column not in key_columns:
+        key_columns = key_columns + [column]
+
+    with IndexedCsv(csv_file, key_columns) as table:
+        for row in table.get(column, key):
+            print(json.dumps(row, ensure_ascii=False, indent=2))
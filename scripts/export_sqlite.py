@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Export the integrated dataset into one SQLite file.
+
+Raw tables keep each CSV's own columns:
+  moths (ListMJ_hostplants_master.csv), hamushi, butterflies, buprestids,
+  leafbeetles, emergence_times, wamei_checklist
+
+Derived tables make cross-dataset questions a single query:
+  species          - every insect from the host tables; id is unique and
+                     matches data/families and related_species.json
+                     (catalog-N-2, ... for a repeated catalog number),
+                     page_id is the meta page (meta/moth/catalog-N.html)
+  host_edges       - species -> host plant, with the plant's family
+  emergence_months - species name -> month (1-12) of adult emergence
+  species_fts      - FTS5 (trigram) index over Japanese and scientific names
+
+For example, moths on バラ科 flying in winter:
+
+    SELECT DISTINCT s.wamei, s.scientific_name
+    FROM host_edges h
+    JOIN species s ON s.key = h.species_key
+    JOIN emergence_months e ON e.wamei = s.wamei
+    WHERE h.plant_family = 'バラ科' AND e.month IN (12, 1, 2);
+
+Everything is loaded with executemany inside one transaction into a
+temporary file, which replaces the output only once it is complete.
+"""
+
+import os
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from build_family_shards import species_id, unique_species_ids
+from build_genus_mapping import load_checklist_index, load_genus_mapping
+from comprehensive_csv_cleaner import tokenize_plant_text
+from extract_emergence_time import parse_emergence_months
+from records import iter_records, iter_rows, read_csv, unique_columns
+
+
+def _path(*parts):
+    return os.path.join(ROOT, *parts)
+
+
+# (table, CSV file, source label, 和名 column, 学名 column, 食草 column)
+HOST_TABLES = [
+    ('moths', _path('ListMJ_hostplants_master.csv'), 'master', '和名', '学名', '食草'),
+    ('hamushi', _path('hamushi_species_integrated.csv'), 'hamushi', '和名', '学名', '食草'),
+    ('butterflies', _path('butterfly_host.csv'), 'butterfly', '和名', None, '食草'),
+    ('buprestids', _path('buprestidae_host.csv'), 'buprestidae', '和名', None, '食草'),
+    ('leafbeetles', _path('leafbeetle_hostplants.csv'), 'leafbeetle', '和名', '学名', '食草'),
+]
+
+# (CSV file, 和名 column, 学名 column, period column, source label)
+EMERGENCE_FILES = [
+    (_path('emergence_time_integrated.csv'), '和名', '学名', '成虫出現時期', None),
+    (_path('日本の冬夜蛾.csv'), '和名', '学名', '成虫の発生時期', '日本の冬夜蛾'),
+    (_path('日本の冬尺蛾.csv'), '和名', '学名', '成虫の発生時期', '日本の冬尺蛾'),
+]
+
+CHECKLIST_FILE = _path('wamei_checklist_ver.1.10.csv')
+
+SCHEMA = """
+CREATE TABLE species (
+    key INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    page_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    source_row INTEGER NOT NULL,
+    wamei TEXT,
+    scientific_name TEXT,
+    family TEXT,
+    family_ja TEXT,
+    genus TEXT,
+    catalog_no TEXT
+);
+CREATE TABLE host_edges (
+    species_key INTEGER NOT NULL,
+    plant TEXT NOT NULL,
+    plant_family TEXT
+);
+CREATE TABLE emergence_times (
+    wamei TEXT,
+    scientific_name TEXT,
+    period TEXT,
+    source TEXT
+);
+CREATE TABLE emergence_months (
+    wamei TEXT NOT NULL,
+    month INTEGER NOT NULL
+);
+"""
+
+# Covering indexes for the lookups the site and ad hoc queries make
+INDEXES = """
+CREATE INDEX species_page_id ON species (page_id);
+CREATE INDEX species_wamei ON species (wamei, id);
+CREATE INDEX species_scientific_name ON species (scientific_name, id);
+CREATE INDEX species_family ON species (family, family_ja, id);
+CREATE INDEX species_family_ja ON species (family_ja, id);
+CREATE INDEX species_catalog_no ON species (catalog_no, id);
+CREATE INDEX host_edges_plant ON host_edges (plant, plant_family, species_key);
+CREATE INDEX host_edges_family ON host_edges (plant_family, species_key, plant);
+CREATE INDEX host_edges_species ON host_edges (species_key, plant, plant_family);
+CREATE INDEX emergence_months_month ON emergence_months (month, wamei);
+CREATE INDEX emergence_months_wamei ON emergence_months (wamei, month);
+CREATE INDEX emergence_times_wamei ON emergence_times (wamei);
+CREATE INDEX moths_catalog_no ON moths ("大図鑑カタログNo");
+CREATE INDEX moths_wamei ON moths ("和名");
+CREATE INDEX moths_family ON moths ("科名", "科和名");
+CREATE INDEX wamei_checklist_all_name ON wamei_checklist (all_name);
+CREATE INDEX wamei_checklist_hub_name ON wamei_checklist ("Hub name");
+CREATE INDEX wamei_checklist_family ON wamei_checklist ("Family name (JP)");
+"""
+
+
+def execute_statements(conn, script):
+    """Run a ;-separated script without executescript()'s implicit COMMIT."""
+    for statement in script.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def load_raw_table(conn, table, header, rows):
+    """Create table with the CSV's columns and insert rows (any iterable); return the row count."""
+    columns = unique_columns(header)
+    quoted = ', '.join(f'"{name}" TEXT' for name in columns)
+    conn.execute(f'CREATE TABLE {table} (row INTEGER PRIMARY KEY, {quoted})')
+    placeholders = ', '.join('?' * (len(columns) + 1))
+    width = len(columns)
+    conn.executemany(
+        f'INSERT INTO {table} VALUES ({placeholders})',
+        ([index] + (row + [''] * width)[:width] for index, row in enumerate(rows)))
+    return conn.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+
+
+def resolve_plant_family(plant, family, checklist_index, genus_mapping):
+    """食草テキストに科名がなければ属の対応表かチェックリストから補う"""
+    if family:
+        return family
+    if plant in genus_mapping:
+        return genus_mapping[plant][0]
+    return checklist_index.get(plant, '')
+
+
+def export_sqlite(output_file, host_tables=HOST_TABLES, emergence_files=EMERGENCE_FILES,
+                  checklist_file=CHECKLIST_FILE):
+    """
+    Build the SQLite database at output_file.
+    """
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    tmp_file = output_file + '.tmp'
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+    checklist_index = load_checklist_index(checklist_file)
+    genus_mapping = load_genus_mapping()
+
+    conn = sqlite3.connect(tmp_file, isolation_level=None)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+
+    counts = {}
+    conn.execute('BEGIN')
+    try:
+        execute_statements(conn, SCHEMA)
+
+        species_rows = []
+        edges = []
+        for table, csv_file, source, wamei_col, sci_col, host_col in host_tables:
+            header, rows = read_csv(csv_file)
+            load_raw_table(conn, table, header, rows)
+            counts[table] = len(rows)
+
+            position = {name: i for i, name in enumerate(header)}
+            unique_ids = unique_species_ids(rows)[0] if source == 'master' else None
+
+            def value(row, column):
+                i = position.get(column)
+                return row[i].strip() if column and i is not None and i < len(row) else ''
+
+            for index, row in enumerate(rows):
+                if source == 'master':
+                    row_id, page_id = unique_ids[index], species_id(row, index)
+                    family, family_ja = value(row, '科名'), value(row, '科和名')
+                    genus, catalog_no = value(row, '属名'), value(row, '大図鑑カタログNo')
+                    scientific_name = value(row, sci_col)
+                elif source == 'hamushi':
+                    row_id = page_id = f"hamushi-{value(row, '大図鑑カタログNo') or index}"
+                    family, family_ja = value(row, '科名'), value(row, '科和名')
+                    genus, catalog_no = value(row, '属名'), ''
+                    scientific_name = value(row, sci_col)
+                else:
+                    row_id = page_id = f"{source}-{index}"
+                    family_value = value(row, '科')
+                    family, family_ja = ('', family_value) if family_value.endswith('科') else (family_value, '')
+                    genus, catalog_no = value(row, '属'), ''
+                    scientific_name = value(row, sci_col) or ' '.join(
+                        part for part in (genus, value(row, '種小名')) if part)
+
+                key = len(species_rows)
+                species_rows.append((key, row_id, page_id, source, index, value(row, wamei_col), scientific_name,
+                                     family, family_ja, genus, catalog_no))
+
+                seen = set()
+                for plant, plant_family, _ in tokenize_plant_text(value(row, host_col)):
+                    plant_family = resolve_plant_family(plant, plant_family, checklist_index, genus_mapping)
+                    if plant and plant != '不明' and plant not in seen:
+                        seen.add(plant)
+                        edges.append((key, plant, plant_family))
+
+        conn.executemany('INSERT INTO species VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', species_rows)
+        conn.executemany('INSERT INTO host_edges VALUES (?, ?, ?)', edges)
+        counts['species'] = len(species_rows)
+        counts['host_edges'] = len(edges)
+
+        emergence_rows = []
+        month_rows = set()
+        for csv_file, wamei_col, sci_col, period_col, source in emergence_files:
+            for record in iter_records(csv_file):
+                wamei, period = record.get(wamei_col).strip(), record.get(period_col).strip()
+                if not wamei or not period:
+                    continue
+                emergence_rows.append((wamei, record.get(sci_col).strip(), period,
+                                       source or record.get('出典').strip()))
+                month_rows.update((wamei, month) for month in parse_emergence_months(period))
+        conn.executemany('INSERT INTO emergence_times VALUES (?, ?, ?, ?)', emergence_rows)
+        conn.executemany('INSERT INTO emergence_months VALUES (?, ?)', sorted(month_rows))
+        counts['emergence_times'] = len(emergence_rows)
+        counts['emergence_months'] = len(month_rows)
+
+        # The checklist is the largest input, so it is streamed straight into SQLite
+        rows = iter_rows(checklist_file)
+        counts['wamei_checklist'] = load_raw_table(conn, 'wamei_checklist', next(rows), rows)
+
+        execute_statements(conn, INDEXES)
+
+        # Trigram tokens let 「シロシタ」 match inside 「ハイイロシロシタバ」
+        conn.execute("""
+            CREATE VIRTUAL TABLE species_fts USING fts5(
+                species_key UNINDEXED, wamei, other_names, scientific_name, tokenize = 'trigram')
+        """)
+        conn.execute("""
+            INSERT INTO species_fts (species_key, wamei, other_names, scientific_name)
+            SELECT s.key, s.wamei,
+                   trim(coalesce(m."旧和名", '') || ' ' || coalesce(m."別名", '') || ' ' || coalesce(m."その他の和名", '')),
+                   s.scientific_name
+            FROM species s
+            LEFT JOIN moths m ON s.source = 'master' AND m.row = s.source_row
+        """)
+        conn.execute("INSERT INTO species_fts (species_fts) VALUES ('optimize')")
+        conn.execute('COMMIT')
+    except Exception:
+        conn.close()
+        os.remove(tmp_file)
+        raise
+
+    conn.execute('ANALYZE')
+    conn.close()
+    os.replace(tmp_file, output_file)
+
+    print(f"SQLite database written to: {output_file} ({time.perf_counter() - start:.2f}s)")
+    for table, count in counts.items():
+        print(f"   {table}: {count}")
+
+    return counts
+
+
+if __name__ == "__main__":
+    output_file = sys.argv[1] if len(sys.argv) > 1 else _path('data', 'hostplants.sqlite')
+
+    export_sqlite(output_file)
@@ -1,46 +1,94 @@
 #!/usr/bin/env python3
 
 import csv
+import os
+import re
 import sys
 
-def extract_emergence_time_data():
-    # Read existing integrated data
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from records import iter_records, record_class
+
+FIELDNAMES = ['和名', '学名', '成虫出現時期', '出典', '備考']
+EmergenceRecord = record_class(FIELDNAMES, 'EmergenceRecord')
+
+# 「4~9月」「3月下旬~5月上旬」「10月頃羽化し、翌年5月頃まで」のような期間
+MONTH_RANGE_PATTERN = re.compile(r'(\d{1,2})(?:月)?[^\d~、,()]{0,8}~[^\d]{0,4}(\d{1,2})月')
+MONTH_PATTERN = re.compile(r'(\d{1,2})月')
+
+
+def parse_emergence_months(text):
+    """
+    Parse an emergence period into the sorted list of months (1-12) it covers.
+
+    Ranges may wrap the year end ("11~3月"). Months in parentheses, such as
+    "(山地では6~8月)", are included.
+    """
+    if not text:
+        return []
+
+    text = text.translate(str.maketrans('０１２３４５６７８９〜～－-', '0123456789~~~~'))
+    text = re.sub(r'から|[、,]\s*翌年', '~', text)
+
+    months = set()
+    for match in MONTH_RANGE_PATTERN.finditer(text):
+        start, end = int(match.group(1)), int(match.group(2))
+        if not (1 <= start <= 12 and 1 <= end <= 12):
+            continue
+        if start <= end:
+            months.update(range(start, end + 1))
+        else:
+            months.update(range(start, 13))
+            months.update(range(1, end + 1))
+    text = MONTH_RANGE_PATTERN.sub(' ', text)
+
+    for match in MONTH_PATTERN.finditer(text):
+        month = int(match.group(1))
+        if 1 <= month <= 12:
+            months.add(month)
+
+    return sorted(months)
+
+def extract_emergence_time_data(output_file='emergence_time_integrated.csv',
+                                 kiriga_file='日本のキリガ.csv',
+                                 hamushi_files=('hamushi_species_integrated.csv', 'ハムシ.csv', 'hamushi.csv'),
+                                 manual_file='emergence_time_manual.csv'):
+    """
+    Build emergence_time_integrated.csv from scratch.
+
+    Rows come from manual_file (entries from other sources, such as 標準図鑑,
+    in the output's columns), then 日本のキリガ, then the hamushi data; the
+    first row for a (和名, 学名) wins. Extracted periods that name no month
+    ("不明", or text from a misaligned row such as "ハムシ目録データベース")
+    are skipped. The output is never read back, so the same inputs always
+    give the same file.
+    """
     existing_records = {}
-    try:
-        with open('emergence_time_integrated.csv', 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                key = (row['和名'], row['学名'])
-                existing_records[key] = row
-        print(f"Loaded {len(existing_records)} existing records from integrated CSV")
-    except:
-        # If file doesn't exist or is empty, start fresh
-        print("Starting with empty integrated CSV")
+    if os.path.exists(manual_file):
+        for row in iter_records(manual_file):
+            key = (row['和名'], row['学名'])
+            existing_records[key] = EmergenceRecord.from_row([row.get(name) for name in FIELDNAMES])
+        print(f"Loaded {len(existing_records)} manual records from {manual_file}")
     
     all_records = list(existing_records.values())
     
     # Extract from 日本のキリガ.csv
-    print("\nExtracting from 日本のキリガ.csv...")
+    print(f"\nExtracting from {kiriga_file}...")
     kiriga_count = 0
-    with open('日本のキリガ.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            japanese_name = row.get('和名', '').strip()
-            scientific_name = row.get('学名', '').strip()
-            emergence_time = row.get('成虫の発生時期', '').strip()
-            
-            if japanese_name and scientific_name and emergence_time and emergence_time != '不明':
-                key = (japanese_name, scientific_name)
-                if key not in existing_records:
-                    all_records.append({
-                        '和名': japanese_name,
-                        '学名': scientific_name,
-                        '成虫出現時期': emergence_time,
-                        '出典': '日本のキリガ',
-                        '備考': ''
-                    })
-                    existing_records[key] = all_records[-1]
-                    kiriga_count += 1
+    for row in iter_records(kiriga_file):
+        japanese_name = row.get('和名').strip()
+        scientific_name = row.get('学名').strip()
+        emergence_time = row.get('成虫の発生時期').strip()
+        
+        if japanese_name and scientific_name and parse_emergence_months(emergence_time):
+            key = (japanese_name, scientific_name)
+            if key not in existing_records:
+                all_records.append(EmergenceRecord.from_row(
+                    [japanese_name, scientific_name, emergence_time, '日本のキリガ', '']))
+                existing_records[key] = all_records[-1]
+                kiriga_count += 1
     
     print(f"Found {kiriga_count} new records from 日本のキリガ")
     
@@ -49,33 +97,23 @@ def extract_emergence_time_data():
     hamushi_count = 0
     
     # Try different hamushi file names
-    hamushi_files = ['hamushi_species_integrated.csv', 'ハムシ.csv', 'hamushi.csv']
-    
     for hamushi_file in hamushi_files:
-        try:
-            with open(hamushi_file, 'r', encoding='utf-8') as f:
-                print(f"Found hamushi file: {hamushi_file}")
-                reader = csv.DictReader(f)
-                for row in reader:
-                    japanese_name = row.get('和名', '').strip()
-                    scientific_name = row.get('学名', '').strip()
-                    emergence_time = row.get('成虫出現時期', '').strip()
-                    
-                    if japanese_name and scientific_name and emergence_time and emergence_time != '不明':
-                        key = (japanese_name, scientific_name)
-                        if key not in existing_records:
-                            all_records.append({
-                                '和名': japanese_name,
-                                '学名': scientific_name,
-                                '成虫出現時期': emergence_time,
-                                '出典': 'ハムシハンドブック',
-                                '備考': ''
-                            })
-                            existing_records[key] = all_records[-1]
-                            hamushi_count += 1
-                break  # If we found one file, don't try others
-        except FileNotFoundError:
+        if not os.path.exists(hamushi_file):
             continue
+        print(f"Found hamushi file: {hamushi_file}")
+        for row in iter_records(hamushi_file):
+            japanese_name = row.get('和名').strip()
+            scientific_name = row.get('学名').strip()
+            emergence_time = row.get('成虫出現時期').strip()
+            
+            if japanese_name and scientific_name and parse_emergence_months(emergence_time):
+                key = (japanese_name, scientific_name)
+                if key not in existing_records:
+                    all_records.append(EmergenceRecord.from_row(
+                        [japanese_name, scientific_name, emergence_time, 'ハムシハンドブック', '']))
+                    existing_records[key] = all_records[-1]
+                    hamushi_count += 1
+        break  # If we found one file, don't try others
     
     if hamushi_count == 0:
         print("No hamushi files found or no emergence time data in hamushi files")
@@ -86,12 +124,12 @@ def extract_emergence_time_data():
     all_records.sort(key=lambda x: x['和名'])
     
     # Save to CSV
-    with open('emergence_time_integrated.csv', 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['和名', '学名', '成虫出現時期', '出典', '備考'])
-        writer.writeheader()
-        writer.writerows(all_records)
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(record.values() for record in all_records)
     
-    print(f"\nSaved {len(all_records)} total records to emergence_time_integrated.csv")
+    print(f"\nSaved {len(all_records)} total records to {output_file}")
     
     # Show sample
     print("\nSample of integrated data:")
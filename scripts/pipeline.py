@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Build steps for the derived data files and a runner for them.
+
+Each step names the files it reads and writes, so the steps form a DAG:
+a step depends on every step that writes one of its inputs. Independent
+steps run in parallel worker processes.
+
+A step is skipped when its outputs exist and its fingerprint (the content
+hashes of its inputs, its arguments, the source of the module that
+implements it and of every repository module that module imports, directly
+or not) matches the one recorded in .pipeline-cache.json by the last
+successful run. Paths in the fingerprint are relative to the
+repository root, so a clean checkout rebuilds everything exactly once.
+
+Usage:
+    python scripts/pipeline.py [step ...] [--force] [--jobs N] [--verbose] [--list]
+
+The plant_pages step rewrites the plant meta pages (meta/plant), their
+sitemap.xml entries and data/plant_redirects.json from the SQLite export;
+the other meta pages come from the frontend build.
+"""
+
+import argparse
+import ast
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import build_genus_mapping
+import comprehensive_csv_cleaner
+import fix_csv_properly
+import fix_remaining_issues
+from build_family_shards import build_family_shards
+from build_image_manifest import build_image_manifest
+from build_phenology import build_phenology
+from build_plant_pages import build_plant_pages
+from build_related_species import build_related_species
+from build_taxonomy import build_taxonomy
+from csv_index import build_csv_index, index_path
+from export_sqlite import CHECKLIST_FILE, EMERGENCE_FILES, HOST_TABLES, export_sqlite
+from extract_emergence_time import extract_emergence_time_data
+
+Step = namedtuple('Step', ['name', 'inputs', 'outputs', 'func', 'args'])
+
+
+def _path(*parts):
+    return os.path.join(ROOT, *parts)
+
+
+HOST_FILES = build_genus_mapping.HOST_FILES
+
+STEPS = [
+    Step('kiriga_corrected',
+         [_path('日本のキリガ_fixed.csv')],
+         [_path('日本のキリガ_corrected.csv')],
+         fix_csv_properly.fix_csv_structure,
+         (_path('日本のキリガ_fixed.csv'), _path('日本のキリガ_corrected.csv'))),
+    Step('kiriga_final',
+         [_path('日本のキリガ_corrected.csv')],
+         [_path('日本のキリガ_final.csv')],
+         fix_remaining_issues.fix_remaining_issues,
+         (_path('日本のキリガ_corrected.csv'), _path('日本のキリガ_final.csv'))),
+    Step('emergence_time',
+         [_path('日本のキリガ_final.csv'), _path('hamushi_species_integrated.csv'),
+          _path('emergence_time_manual.csv')],
+         [_path('emergence_time_integrated.csv')],
+         extract_emergence_time_data,
+         (_path('emergence_time_integrated.csv'), _path('日本のキリガ_final.csv'),
+          (_path('hamushi_species_integrated.csv'),), _path('emergence_time_manual.csv'))),
+    Step('genus_mapping',
+         [build_genus_mapping.CHECKLIST_FILE, build_genus_mapping.YLIST_FILE,
+          build_genus_mapping.GENUS_OVERRIDES_FILE] + HOST_FILES,
+         [build_genus_mapping.GENUS_MAPPING_FILE],
+         build_genus_mapping.build_genus_mapping,
+         ()),
+    Step('cleaned_master',
+         [_path('ListMJ_hostplants_master.csv'), build_genus_mapping.GENUS_MAPPING_FILE],
+         [_path('ListMJ_hostplants_cleaned_comprehensive.csv')],
+         comprehensive_csv_cleaner.clean_csv_file,
+         (_path('ListMJ_hostplants_master.csv'), _path('ListMJ_hostplants_cleaned_comprehensive.csv'), 24)),
+    Step('family_shards',
+         [_path('ListMJ_hostplants_master.csv')],
+         [_path('data', 'families')],
+         build_family_shards,
+         (_path('ListMJ_hostplants_master.csv'), _path('data', 'families'))),
+    Step('image_manifest',
+         [_path('images', 'insects'), _path('images', 'plants')],
+         [_path('image_filenames.txt'), _path('image_extensions.json'), _path('plant_image_filenames.txt')],
+         build_image_manifest,
+         (_path('images'), ROOT)),
+    Step('master_index',
+         [_path('ListMJ_hostplants_master.csv')],
+         [index_path(_path('ListMJ_hostplants_master.csv'))],
+         build_csv_index,
+         (_path('ListMJ_hostplants_master.csv'),)),
+    Step('checklist_index',
+         [build_genus_mapping.CHECKLIST_FILE],
+         [index_path(build_genus_mapping.CHECKLIST_FILE)],
+         build_csv_index,
+         (build_genus_mapping.CHECKLIST_FILE,)),
+    Step('sqlite',
+         [table[1] for table in HOST_TABLES] + [entry[0] for entry in EMERGENCE_FILES]
+         + [CHECKLIST_FILE, build_genus_mapping.GENUS_MAPPING_FILE],
+         [_path('data', 'hostplants.sqlite')],
+         export_sqlite,
+         (_path('data', 'hostplants.sqlite'),)),
+    Step('related_species',
+         [_path('ListMJ_hostplants_master.csv'), _path('data', 'hostplants.sqlite')],
+         [_path('data', 'related_species.json')],
+         build_related_species,
+         (_path('ListMJ_hostplants_master.csv'), _path('data', 'hostplants.sqlite'),
+          _path('data', 'related_species.json'))),
+    Step('phenology',
+         [_path('data', 'hostplants.sqlite'), CHECKLIST_FILE, build_genus_mapping.GENUS_MAPPING_FILE],
+         [_path('data', 'phenology.bin'), _path('data', 'phenology.json')],
+         build_phenology,
+         (_path('data', 'hostplants.sqlite'), _path('data', 'phenology.bin'),
+          _path('data', 'phenology.json'), CHECKLIST_FILE, build_genus_mapping.GENUS_MAPPING_FILE)),
+    Step('taxonomy',
+         [_path('ListMJ_hostplants_master.csv'), _path('hamushi_species_integrated.csv'),
+          _path('data', 'hostplants.sqlite')],
+         [_path('data', 'taxonomy.json')],
+         build_taxonomy,
+         (_path('data', 'hostplants.sqlite'), _path('data', 'taxonomy.json'))),
+    Step('plant_pages',
+         [_path('data', 'hostplants.sqlite'), CHECKLIST_FILE, build_genus_mapping.GENUS_MAPPING_FILE,
+          _path('images', 'plants')],
+         [_path('meta', 'plant'), _path('sitemap.xml'), _path('data', 'plant_redirects.json')],
+         build_plant_pages,
+         (_path('data', 'hostplants.sqlite'), _path('meta', 'plant'), _path('data', 'plant_redirects.json'),
+          CHECKLIST_FILE, _path('sitemap.xml'), build_genus_mapping.GENUS_MAPPING_FILE,
+          _path('images', 'plants'))),
+]
+
+STEPS_BY_NAME = {step.name: step for step in STEPS}
+
+CACHE_FILE = _path('.pipeline-cache.json')
+
+# Where the modules a step imports can live (ROOT and scripts/ are both on sys.path)
+MODULE_DIRS = [ROOT, _path('scripts')]
+
+
+def covers(target, path):
+    """True if path is target itself or a file inside the target directory."""
+    return path == target or path.startswith(target + os.sep)
+
+
+def dependencies(step, steps=STEPS):
+    """Names of the steps that write one of step's inputs."""
+    return {other.name for other in steps
+            if other.name != step.name
+            and any(covers(output, path) or covers(path, output)
+                    for output in other.outputs for path in step.inputs)}
+
+
+def downstream(names, steps=STEPS):
+    """names plus every step that (transitively) depends on one of them."""
+    selected = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for step in steps:
+            if step.name not in selected and dependencies(step, steps) & selected:
+                selected.add(step.name)
+                changed = True
+    return selected
+
+
+def upstream(names, steps=STEPS):
+    """names plus every step they (transitively) depend on."""
+    by_name = {step.name: step for step in steps}
+    selected = set()
+    stack = list(names)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(dependencies(by_name[name], steps))
+    return selected
+
+
+def steps_for_changes(changed_paths, steps=STEPS):
+    """Names of the steps to rerun after changed_paths were edited."""
+    direct = {step.name for step in steps
+              if any(covers(source, path) for source in step.inputs for path in changed_paths)}
+    return downstream(direct, steps)
+
+
+def _relative(value):
+    """Make paths inside the repository relative so fingerprints are portable."""
+    if isinstance(value, str) and covers(ROOT, value):
+        return os.path.relpath(value, ROOT)
+    if isinstance(value, (list, tuple)):
+        return [_relative(item) for item in value]
+    return value
+
+
+def file_hash(path, _memo={}):
+    """sha256 of a file, memoized on (path, mtime, size)."""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _memo:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _memo[key] = digest.hexdigest()
+    return _memo[key]
+
+
+def input_hash(path):
+    """Hash of a file, or of the top-level files of a directory."""
+    if os.path.isdir(path):
+        digest = hashlib.sha256()
+        for entry in sorted(os.listdir(path)):
+            entry_path = os.path.join(path, entry)
+            if os.path.isfile(entry_path):
+                digest.update(f"{entry}:{file_hash(entry_path)}\n".encode('utf-8'))
+        return digest.hexdigest()
+    if os.path.exists(path):
+        return file_hash(path)
+    return 'missing'
+
+
+def imported_modules(path):
+    """Files of the repository modules that the module at path imports."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split('.')[0])
+    files = set()
+    for name in names:
+        for directory in MODULE_DIRS:
+            candidate = os.path.join(directory, f"{name}.py")
+            if os.path.exists(candidate):
+                files.add(candidate)
+                break
+    return files
+
+
+def code_files(path, _memo={}):
+    """path and every repository module it imports, transitively."""
+    if path not in _memo:
+        seen = {path}
+        stack = [path]
+        while stack:
+            for module in imported_modules(stack.pop()):
+                if module not in seen:
+                    seen.add(module)
+                    stack.append(module)
+        _memo[path] = sorted(seen)
+    return _memo[path]
+
+
+def fingerprint(step):
+    """Hash of everything that determines a step's outputs."""
+    code_file = os.path.abspath(sys.modules[step.func.__module__].__file__)
+    parts = {
+        'name': step.name,
+        'func': step.func.__qualname__,
+        'args': _relative(list(step.args)),
+        'code': {_relative(path): file_hash(path) for path in code_files(code_file)},
+        'inputs': {_relative(path): input_hash(path) for path in step.inputs},
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def load_cache(cache_file=CACHE_FILE):
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_cache(cache, cache_file=CACHE_FILE):
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, cache_file)
+
+
+def is_fresh(step, cache, step_fingerprint):
+    return (cache.get(step.name) == step_fingerprint
+            and all(os.path.exists(output) for output in step.outputs))
+
+
+def _run_step(name):
+    """Run one step in a worker; returns (name, seconds, captured stdout)."""
+    step = STEPS_BY_NAME[name]
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        step.func(*step.args)
+    return name, time.perf_counter() - start, output.getvalue()
+
+
+def run_steps(names, jobs=None, verbose=False, force=False):
+    """
+    Run the named steps, each as soon as the steps it depends on are done.
+
+    Steps whose fingerprint is unchanged are skipped unless force is set.
+    Returns the names of the steps that failed; steps downstream of a
+    failure are not run.
+    """
+    pending = {name: dependencies(STEPS_BY_NAME[name]) & set(names) for name in names}
+    done = set()
+    failed = set()
+    running = {}
+    cache = load_cache()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            ready = [name for name, deps in pending.items() if deps <= done]
+            while ready:
+                for name in ready:
+                    del pending[name]
+                    # Fingerprint once upstream steps have rewritten our inputs
+                    step_fingerprint = fingerprint(STEPS_BY_NAME[name])
+                    if not force and is_fresh(STEPS_BY_NAME[name], cache, step_fingerprint):
+                        done.add(name)
+                        print(f"  fresh {name}")
+                        continue
+                    future = executor.submit(_run_step, name)
+                    running[future] = (name, step_fingerprint)
+                ready = [name for name, deps in pending.items() if deps <= done]
+
+            # Anything left waiting on a failed step will never become ready
+            blocked = [name for name, deps in pending.items() if deps & failed]
+            while blocked:
+                for name in blocked:
+                    del pending[name]
+                    failed.add(name)
+                    print(f"  skip  {name} (upstream failed)")
+                blocked = [name for name, deps in pending.items() if deps & failed]
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, step_fingerprint = running.pop(future)
+                try:
+                    _, seconds, output = future.result()
+                except Exception as e:
+                    failed.add(name)
+                    cache.pop(name, None)
+                    save_cache(cache)
+                    print(f"  FAIL  {name}: {e}")
+                    continue
+                done.add(name)
+                cache[name] = step_fingerprint
+                save_cache(cache)
+                print(f"  ok    {name} ({seconds:.2f}s)")
+                if verbose and output:
+                    print(output.rstrip())
+
+    return failed
+
+
+def print_steps(steps=STEPS):
+    for step in steps:
+        deps = ', '.join(sorted(dependencies(step, steps))) or '-'
+        print(f"{step.name}  (after: {deps})")
+        for path in step.inputs:
+            print(f"    < {_relative(path)}")
+        for path in step.outputs:
+            print(f"    > {_relative(path)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild stale derived data files.")
+    parser.add_argument('steps', nargs='*', help="steps to build, with their upstream steps (default: all)")
+    parser.add_argument('--force', action='store_true', help="rerun steps even if their fingerprint is unchanged")
+    parser.add_argument('--jobs', type=int, default=None, help="parallel worker processes")
+    parser.add_argument('--verbose', action='store_true', help="show the output of each step")
+    parser.add_argument('--list', action='store_true', help="list the steps and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        print_steps()
+        sys.exit(0)
+
+    unknown = [name for name in args.steps if name not in STEPS_BY_NAME]
+    if unknown:
+        parser.error(f"unknown step: {', '.join(unknown)}")
+
+    names = upstream(args.steps) if args.steps else {step.name for step in STEPS}
+    failed = run_steps(names, jobs=args.jobs, verbose=args.verbose, force=args.force)
+    sys.exit(1 if failed else 0)
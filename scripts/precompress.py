@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Write .gz and .br siblings for the site's text artifacts at maximum compression.
+
+Covers only what the site serves: the top-level pages, sitemap and data
+files the frontend fetches (SHIPPED_FILES) and the text files under assets/,
+meta/ and data/ (SHIPPED_DIRS). Backups, working copies and the *.idx.sqlite
+sidecars are never compressed. Files are compressed in parallel worker
+processes. A file whose sha256 matches the one recorded in
+.precompress-manifest.json, and whose siblings still exist, is skipped.
+Siblings whose source is gone or no longer shipped are deleted.
+
+The siblings are build output and are not committed (see .gitignore).
+
+Brotli output needs the optional "brotli" package; without it only .gz files
+are written.
+
+This runs as the last stage before deploy rather than as a pipeline step,
+since its input is the whole site tree.
+
+Usage:
+    python scripts/precompress.py [--force] [--jobs N] [--verbose]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MANIFEST_FILE = os.path.join(ROOT, '.precompress-manifest.json')
+
+COMPRESSIBLE_EXTENSIONS = ('.csv', '.html', '.js', '.css', '.json', '.txt', '.xml', '.svg')
+SIBLING_EXTENSIONS = ('.gz', '.br')
+SKIP_DIRS = {'.git', 'images', 'node_modules', '__pycache__', '.venv', 'venv'}
+MIN_SIZE = 256
+
+# Top-level files the site serves; the CSVs and manifests are the ones the
+# frontend bundle fetches
+SHIPPED_FILES = [
+    'index.html', '404.html', 'privacy-policy.html', 'terms-of-service.html',
+    'sitemap.xml', 'robots.txt', 'ads.txt', 'favicon.svg', 'vite.svg',
+    'ListMJ_hostplants_master.csv', 'wamei_checklist_ver.1.10.csv', '20210514YList_download.csv',
+    'hamushi_species_integrated.csv', 'butterfly_host.csv', 'buprestidae_host.csv',
+    '日本の冬夜蛾.csv', '日本の冬尺蛾.csv', 'emergence_time_integrated.csv', 'genus_mapping.csv',
+    'image_filenames.txt', 'image_extensions.json', 'plant_image_filenames.txt',
+]
+# Directories whose compressible files are all served
+SHIPPED_DIRS = ['assets', 'meta', 'data']
+
+
+def find_targets(root):
+    """Relative paths of the shipped compressible files under root."""
+    paths = [os.path.join(root, name) for name in SHIPPED_FILES]
+    for directory in SHIPPED_DIRS:
+        for dirpath, dirnames, filenames in os.walk(os.path.join(root, directory)):
+            dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS and not name.startswith('.')]
+            paths.extend(os.path.join(dirpath, filename) for filename in filenames
+                         if not filename.startswith('.'))
+
+    targets = []
+    for path in paths:
+        if path.endswith(COMPRESSIBLE_EXTENSIONS) and os.path.isfile(path) and os.path.getsize(path) >= MIN_SIZE:
+            targets.append(os.path.relpath(path, root))
+    return sorted(targets)
+
+
+def remove_orphans(root, targets):
+    """Delete .gz/.br siblings whose source is not a target; return how many."""
+    targets = set(targets)
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS and not name.startswith('.')]
+        for filename in filenames:
+            source, extension = os.path.splitext(filename)
+            if extension in SIBLING_EXTENSIONS and source.endswith(COMPRESSIBLE_EXTENSIONS):
+                path = os.path.join(dirpath, filename)
+                if os.path.relpath(os.path.join(dirpath, source), root) not in targets:
+                    os.remove(path)
+                    removed += 1
+    return removed
+
+
+def _write_atomic(path, data, mtime):
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, path)
+    os.utime(path, (mtime, mtime))
+
+
+def compress_file(task):
+    """
+    Compress one file unless its hash is unchanged. Runs in a worker.
+
+    Returns (relative path, entry, compressed) where entry holds the hash
+    and the original, gzip and brotli sizes.
+    """
+    root, relpath, previous, force = task
+    path = os.path.join(root, relpath)
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    siblings_exist = os.path.exists(path + '.gz') and (brotli is None or os.path.exists(path + '.br'))
+    if not force and previous and previous.get('sha256') == digest and siblings_exist \
+            and (brotli is None or previous.get('br')):
+        return relpath, previous, False
+
+    mtime = os.path.getmtime(path)
+    gz_data = gzip.compress(data, compresslevel=9, mtime=0)
+    _write_atomic(path + '.gz', gz_data, mtime)
+
+    br_size = None
+    if brotli is not None:
+        br_data = brotli.compress(data, quality=11)
+        _write_atomic(path + '.br', br_data, mtime)
+        br_size = len(br_data)
+
+    entry = {'sha256': digest, 'size': len(data), 'gz': len(gz_data), 'br': br_size}
+    return relpath, entry, True
+
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def precompress(root=ROOT, jobs=None, force=False, verbose=False, manifest_file=MANIFEST_FILE):
+    """
+    Precompress every target under root and print the byte savings.
+    """
+    start = time.perf_counter()
+    if brotli is None:
+        print("brotli is not installed; writing .gz only (pip install brotli for .br)")
+
+    manifest = load_manifest(manifest_file)
+    targets = find_targets(root)
+    tasks = [(root, relpath, manifest.get(relpath), force) for relpath in targets]
+
+    new_manifest = {}
+    compressed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for relpath, entry, changed in executor.map(compress_file, tasks, chunksize=64):
+            new_manifest[relpath] = entry
+            if changed:
+                compressed += 1
+                if verbose:
+                    br = f", br {entry['br']:>9,}" if entry['br'] is not None else ''
+                    print(f"  {relpath}: {entry['size']:>9,} -> gz {entry['gz']:>9,}{br}")
+
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(new_manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+    total = sum(entry['size'] for entry in new_manifest.values())
+    total_gz = sum(entry['gz'] for entry in new_manifest.values())
+    removed = remove_orphans(root, targets)
+
+    print(f"\nPrecompressed {compressed} of {len(targets)} files "
+          f"({len(targets) - compressed} unchanged) in {time.perf_counter() - start:.2f}s")
+    if removed:
+        print(f"   removed {removed} orphaned .gz/.br files")
+    print(f"   original: {total:,} bytes")
+    print(f"   gzip:     {total_gz:,} bytes (saves {total - total_gz:,}, {100 * (1 - total_gz / max(total, 1)):.1f}%)")
+    if brotli is not None:
+        total_br = sum(entry['br'] or 0 for entry in new_manifest.values())
+        print(f"   brotli:   {total_br:,} bytes (saves {total - total_br:,}, {100 * (1 - total_br / max(total, 1)):.1f}%)")
+
+    # The largest files dominate transfer size, so always show them
+    if not verbose:
+        print("\n   largest files:")
+        for relpath, entry in sorted(new_manifest.items(), key=lambda item: -item[1]['size'])[:10]:
+            br = f", br {entry['br']:>9,}" if entry['br'] is not None else ''
+            print(f"   {relpath}: {entry['size']:>9,} -> gz {entry['gz']:>9,}{br}")
+
+    return new_manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write .gz/.br siblings for the site's text artifacts.")
+    parser.add_argument('--force', action='store_true', help="recompress files even if unchanged")
+    parser.add_argument('--jobs', type=int, default=None, help="parallel worker processes")
+    parser.add_argument('--verbose', action='store_true', help="print every compressed file")
+    args = parser.parse_args()
+
+    precompress(jobs=args.jobs, force=args.force, verbose=args.verbose)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Local asyncio JSON server over in-memory host-plant indexes.
+
+Loads data/hostplants.sqlite (built by export_sqlite.py, exported first if
+it is missing) once at startup and serves:
+
+  GET /insect/{id}    the species with that id (catalog-N, catalog-N-2, main-N, ...)
+  GET /plant/{name}   species feeding on a plant
+  GET /search?q=...   species whose Japanese or scientific name contains q
+  GET /month/{m}      species whose adults emerge in month m
+
+Response bodies are serialized once and cached together with their gzip
+encoding and ETags (the gzip body has its own, ending in "-gz"), so repeat
+requests cost one dict lookup. If-None-Match (a list, W/ tags or *) returns
+304 and keep-alive is supported.
+
+Usage:
+    python scripts/query_server.py [--host 127.0.0.1] [--port 8765] [--db PATH]
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict, defaultdict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from export_sqlite import export_sqlite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_DB = os.path.join(ROOT, 'data', 'hostplants.sqlite')
+SEARCH_LIMIT = 50
+SEARCH_CACHE_SIZE = 1024
+MAX_HEADER_BYTES = 16384
+
+REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class Response:
+    """A serialized JSON body with its ETag and gzip encoding."""
+
+    __slots__ = ('status', 'body', 'gzip_body', 'etag', 'gzip_etag')
+
+    def __init__(self, status, payload):
+        self.status = status
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=6, mtime=0)
+        digest = hashlib.sha1(self.body).hexdigest()[:16]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+def load_indexes(db_file):
+    """Read the SQLite export into plain dicts keyed the way the routes look up."""
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+
+    species = {}
+    for row in conn.execute('SELECT * FROM species'):
+        species[row['key']] = {
+            'id': row['id'],
+            'page_id': row['page_id'],
+            'source': row['source'],
+            'wamei': row['wamei'],
+            'scientific_name': row['scientific_name'],
+            'family': row['family'],
+            'family_ja': row['family_ja'],
+            'hosts': [],
+            'months': [],
+        }
+
+    by_plant = defaultdict(list)
+    plant_families = {}
+    for key, plant, plant_family in conn.execute(
+            'SELECT species_key, plant, plant_family FROM host_edges ORDER BY species_key'):
+        species[key]['hosts'].append({'plant': plant, 'family': plant_family})
+        by_plant[plant].append(key)
+        if plant_family:
+            plant_families.setdefault(plant, plant_family)
+
+    months_by_wamei = defaultdict(list)
+    for wamei, month in conn.execute('SELECT wamei, month FROM emergence_months ORDER BY wamei, month'):
+        months_by_wamei[wamei].append(month)
+
+    by_id = {}
+    by_month = defaultdict(list)
+    for key, record in species.items():
+        record['months'] = months_by_wamei.get(record['wamei'], [])
+        by_id[record['id']] = key
+        for month in record['months']:
+            by_month[month].append(key)
+
+    conn.close()
+
+    # One lowercase haystack per species for substring search
+    search_keys = [(f"{record['wamei'] or ''}\t{record['scientific_name'] or ''}".lower(), key)
+                   for key, record in species.items()]
+
+    return {
+        'species': species,
+        'by_id': by_id,
+        'by_plant': by_plant,
+        'plant_families': plant_families,
+        'by_month': by_month,
+        'search_keys': search_keys,
+    }
+
+
+def _summary(record):
+    return {key: record[key] for key in ('id', 'wamei', 'scientific_name', 'family_ja')}
+
+
+class QueryApp:
+    """Routes requests to the prebuilt indexes and caches serialized responses."""
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self.cache = {}
+        self.search_cache = OrderedDict()
+        self.not_found = Response(404, {'error': 'not found'})
+
+    def insect(self, species_id):
+        key = self.indexes['by_id'].get(species_id)
+        if key is None:
+            return self.not_found
+        return Response(200, self.indexes['species'][key])
+
+    def plant(self, name):
+        keys = self.indexes['by_plant'].get(name)
+        if not keys:
+            return self.not_found
+        species = self.indexes['species']
+        return Response(200, {'plant': name,
+                              'family': self.indexes['plant_families'].get(name, ''),
+                              'count': len(keys),
+                              'species': [_summary(species[key]) for key in keys]})
+
+    def month(self, value):
+        if not value.isdigit() or not 1 <= int(value) <= 12:
+            return Response(400, {'error': 'month must be 1-12'})
+        species = self.indexes['species']
+        keys = self.indexes['by_month'].get(int(value), [])
+        return Response(200, {'month': int(value), 'count': len(keys),
+                              'species': [_summary(species[key]) for key in keys]})
+
+    def search(self, query):
+        query = query.strip().lower()
+        if not query:
+            return Response(400, {'error': 'q is required'})
+
+        cached = self.search_cache.get(query)
+        if cached is not None:
+            self.search_cache.move_to_end(query)
+            return cached
+
+        species = self.indexes['species']
+        results = []
+        for haystack, key in self.indexes['search_keys']:
+            if query in haystack:
+                results.append(_summary(species[key]))
+                if len(results) >= SEARCH_LIMIT:
+                    break
+        response = Response(200, {'q': query, 'count': len(results), 'species': results})
+
+        self.search_cache[query] = response
+        if len(self.search_cache) > SEARCH_CACHE_SIZE:
+            self.search_cache.popitem(last=False)
+        return response
+
+    def route(self, target):
+        parts = urlsplit(target)
+        path = unquote(parts.path)
+
+        if path == '/search':
+            return self.search(parse_qs(parts.query).get('q', [''])[0])
+
+        response = self.cache.get(path)
+        if response is not None:
+            return response
+
+        _, _, rest = path.partition('/')
+        route, _, argument = rest.partition('/')
+        if route == 'insect' and argument:
+            response = self.insect(argument)
+        elif route == 'plant' and argument:
+            response = self.plant(argument)
+        elif route == 'month' and argument:
+            response = self.month(argument)
+        else:
+            return self.not_found
+
+        if response.status == 200:
+            self.cache[path] = response
+        return response
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match value (list, W/ tags or *) with etag."""
+    if if_none_match.strip() == '*':
+        return True
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def encode_response(response, request_headers, head_only=False):
+    """Build the raw HTTP/1.1 response bytes for a cached Response."""
+    status = response.status
+    headers = [
+        'Content-Type: application/json; charset=utf-8',
+        'Cache-Control: no-cache',
+        'Vary: Accept-Encoding',
+    ]
+    if 'gzip' in request_headers.get('accept-encoding', ''):
+        body, etag = response.gzip_body, response.gzip_etag
+        headers.append('Content-Encoding: gzip')
+    else:
+        body, etag = response.body, response.etag
+    headers.append(f'ETag: {etag}')
+
+    if status == 200 and etag_matches(request_headers.get('if-none-match', ''), etag):
+        status = 304
+        body = b''
+
+    headers.append(f'Content-Length: {len(body)}')
+    head = f"HTTP/1.1 {status} {REASONS[status]}\r\n" + '\r\n'.join(headers) + '\r\n\r\n'
+    return head.encode('latin-1') + (b'' if head_only else body)
+
+
+async def handle_connection(app, reader, writer):
+    try:
+        while True:
+            try:
+                raw = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+
+            lines = raw.decode('latin-1').split('\r\n')
+            try:
+                method, target, version = lines[0].split(' ', 2)
+            except ValueError:
+                writer.write(encode_response(Response(400, {'error': 'bad request'}), {}))
+                break
+
+            headers = {}
+            for line in lines[1:]:
+                name, sep, value = line.partition(':')
+                if sep:
+                    headers[name.strip().lower()] = value.strip()
+
+            if method not in ('GET', 'HEAD'):
+                writer.write(encode_response(Response(405, {'error': 'method not allowed'}), headers))
+            else:
+                # Routes take a target string, which must be valid UTF-8 once decoded
+                target = target.encode('latin-1').decode('utf-8', 'replace')
+                writer.write(encode_response(app.route(target), headers, head_only=method == 'HEAD'))
+            await writer.drain()
+
+            connection = headers.get('connection', '').lower()
+            if connection == 'close' or (version == 'HTTP/1.0' and connection != 'keep-alive'):
+                break
+    finally:
+        writer.close()
+
+
+async def serve(host, port, db_file):
+    if not os.path.exists(db_file):
+        export_sqlite(db_file)
+
+    start = time.perf_counter()
+    app = QueryApp(load_indexes(db_file))
+    print(f"Loaded {len(app.indexes['species'])} species, {len(app.indexes['by_plant'])} plants "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(app, reader, writer),
+        host, port, limit=MAX_HEADER_BYTES)
+    print(f"Serving on http://{host}:{port}/ (Ctrl-C to stop)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the host-plant indexes as JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--db', default=DEFAULT_DB, help="SQLite file from export_sqlite.py")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.db))
+    except KeyboardInterrupt:
+        print("\nStopped")
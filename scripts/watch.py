@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Watch the source CSVs and images and rebuild only the derived files they feed.
+
+Polls the inputs of every step in pipeline.STEPS. Once edits have been quiet
+for the debounce interval, the steps reading the changed files and everything
+downstream of them are rerun in parallel.
+
+The SQLite export and the steps built on it (phenology, taxonomy, the
+plant meta pages and sitemap.xml) take over a second, so they are held back
+until edits have been quiet for --defer seconds. The cheap steps (cleaned
+master, family shards, indexes) run first; after an edit to the master CSV
+they are done in well under a second. A new or renamed plant photo in
+images/plants rebuilds the plant pages the same way.
+
+Usage:
+    python scripts/watch.py [--interval 0.1] [--debounce 0.25] [--defer 2.0] [--jobs N]
+"""
+
+import argparse
+import os
+import time
+
+from pipeline import STEPS, downstream, run_steps, steps_for_changes
+
+POLL_INTERVAL = 0.1
+DEBOUNCE = 0.25
+DEFER = 2.0
+
+# Slow steps; they and everything downstream of them wait for DEFER
+DEFERRED_STEPS = ['sqlite']
+
+
+def watched_paths(steps=STEPS):
+    """Every input of every step; directories are expanded one level."""
+    paths = set()
+    for step in steps:
+        for path in step.inputs:
+            if os.path.isdir(path):
+                paths.add(path)
+                for entry in os.listdir(path):
+                    paths.add(os.path.join(path, entry))
+            else:
+                paths.add(path)
+    return paths
+
+
+def snapshot(paths):
+    """Map each path to (mtime, size), or None if it does not exist."""
+    state = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            state[path] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            state[path] = None
+    return state
+
+
+def changed_between(before, after):
+    return {path for path in before.keys() | after.keys() if before.get(path) != after.get(path)}
+
+
+def rebuild(names, state, jobs=None):
+    """Run the named steps and take the files they wrote into state."""
+    start = time.perf_counter()
+    failed = run_steps(names, jobs=jobs)
+    print(f"Rebuilt {len(names) - len(failed)}/{len(names)} steps in {time.perf_counter() - start:.2f}s")
+
+    # Files the steps just wrote are not edits; anything else that changed
+    # during the build is still picked up on the next poll.
+    outputs = [output for step in STEPS if step.name in names for output in step.outputs]
+    after = snapshot(watched_paths())
+    for path, value in after.items():
+        if any(path == output or path.startswith(output + os.sep) for output in outputs):
+            state[path] = value
+
+
+def watch(interval=POLL_INTERVAL, debounce=DEBOUNCE, defer=DEFER, jobs=None):
+    state = snapshot(watched_paths())
+    print(f"Watching {len(state)} paths (Ctrl-C to stop)")
+
+    slow = downstream(DEFERRED_STEPS)
+    pending = set()
+    deferred = set()
+    last_change = 0.0
+
+    while True:
+        time.sleep(interval)
+
+        current = snapshot(watched_paths())
+        changed = changed_between(state, current)
+        if changed:
+            pending |= changed
+            last_change = time.monotonic()
+            state = current
+
+        quiet = time.monotonic() - last_change
+        if deferred and not pending and quiet >= defer:
+            names, deferred = deferred, set()
+            print(f"Running deferred steps: {', '.join(sorted(names))}")
+            rebuild(names, state, jobs)
+            continue
+
+        if not pending or quiet < debounce:
+            continue
+
+        names = steps_for_changes(pending)
+        print(f"\n{len(pending)} changed: {', '.join(sorted(os.path.basename(p) for p in pending))}")
+        pending = set()
+        deferred |= names & slow
+        names -= slow
+        if names:
+            rebuild(names, state, jobs)
+        if deferred:
+            print(f"Deferred until {defer:g}s without edits: {', '.join(sorted(deferred))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild derived data files when their sources change.")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="poll interval in seconds")
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE, help="quiet period before rebuilding")
+    parser.add_argument('--defer', type=float, default=DEFER, help="quiet period before the slow steps")
+    parser.add_argument('--jobs', type=int, default=None, help="parallel worker processes")
+    args = parser.parse_args()
+
+    try:
+        watch(args.interval, args.debounce, args.defer, args.jobs)
+    except KeyboardInterrupt:
+        print("\nStopped")